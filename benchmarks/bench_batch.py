@@ -0,0 +1,72 @@
+"""Throughput of analyze_boards against the per-board Connect4Game calls.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batch [boards]
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from engine import COLUMN_COUNT, ROW_COUNT, Bitboard, Connect4Game
+from engine.batch import analyze_boards
+
+
+BOARDS = 200000
+SCALAR_BOARDS = 20000  # the per-board loop is checked and timed on a prefix
+
+
+def random_boards(n, seed=0):
+    # Positions from random games, stopped at a random ply (some finished)
+    rng = random.Random(seed)
+    boards = np.zeros((n, ROW_COUNT, COLUMN_COUNT), dtype=np.int8)
+    for i in range(n):
+        bb = Bitboard()
+        player = 0
+        for _ in range(rng.randint(0, ROW_COUNT * COLUMN_COUNT)):
+            bb.play(rng.choice([col for col in range(COLUMN_COUNT) if bb.can_play(col)]), player)
+            if bb.has_won(player) or bb.is_full():
+                break
+            player = 1 - player
+        boards[i] = bb.to_array()
+    return boards
+
+
+def scalar_analyze(boards):
+    game = Connect4Game()
+    results = []
+    for board in boards:
+        game.bitboard = Bitboard.from_array(board)
+        win1, win2 = game.winning_move(1), game.winning_move(2)
+        winner = win1 + 2 * win2
+        results.append((winner, game.is_board_full() and not winner, game.evaluate()))
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("boards", type=int, nargs="?", default=BOARDS)
+    n = parser.parse_args(argv).boards
+    boards = random_boards(n)
+
+    start = time.perf_counter()
+    winner, draw, score = analyze_boards(boards)
+    batch_time = time.perf_counter() - start
+
+    m = min(n, SCALAR_BOARDS)
+    start = time.perf_counter()
+    expected = scalar_analyze(boards[:m])
+    scalar_time = time.perf_counter() - start
+    for i, (w, d, s) in enumerate(expected):
+        assert (winner[i], draw[i], score[i]) == (w, d, s), i
+
+    print(f"{n} boards: {np.count_nonzero(winner)} won, {np.count_nonzero(draw)} drawn")
+    print(f"  analyze_boards  {n / batch_time:12,.0f} boards/s")
+    print(f"  per-board loop  {m / scalar_time:12,.0f} boards/s  (results match on {m} boards)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
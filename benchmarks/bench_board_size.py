@@ -0,0 +1,101 @@
+"""Search cost as the board grows, from 6x7 connect four to 20x20 connect five.
+
+For every board size: the cost of the win check after a move (lines through
+the last piece vs. the whole board), of evaluate(), and the time, nodes and
+nodes/s of a fresh search to each depth from a short center opening:
+
+    python -m benchmarks.bench_board_size [--depth 5] [--sizes 6x7x4 20x20x5]
+"""
+import argparse
+import random
+import time
+
+from engine import Bitboard, Connect4Game, Rules
+
+
+SIZES = ("6x7x4", "8x9x4", "10x10x5", "15x15x5", "20x20x5")  # rows x columns x connect
+DEPTH = 5
+OPENING_PLIES = 3  # center and next-to-center moves played before searching; odd, so piece 2 is to move
+POSITIONS = 200  # random positions the primitives are timed on
+MIN_SECONDS = 0.2
+
+
+def parse_size(text):
+    rows, columns, connect = (int(part) for part in text.split("x"))
+    return Rules(rows, columns, connect)
+
+
+def random_positions(rules, count, rng):
+    # Bitboards part-way through random games, each ending on a move that
+    # did not win
+    positions = []
+    while len(positions) < count:
+        bb = Bitboard(rules)
+        for _ in range(rng.randrange(1, rules.cells // 2)):
+            bb.play(rng.choice([col for col in range(rules.columns) if bb.can_play(col)]), bb.ply % 2)
+            if bb.last_move_won():
+                bb.undo()
+                break
+        if bb.moves:
+            positions.append(bb)
+    return positions
+
+
+def ops_per_sec(fn, items):
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for item in items:
+            fn(item)
+        count += len(items)
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return count / elapsed
+
+
+def opening(rules):
+    center = rules.columns // 2
+    return [center, center, center - 1, center + 1][:OPENING_PLIES]
+
+
+def time_to_depth(rules, max_depth):
+    results = []
+    for depth in range(1, max_depth + 1):
+        game = Connect4Game(rules=rules)
+        for col in opening(rules):
+            game.make_move(col)
+        assert game.bitboard.ply % 2 == 1, "iterative_deepening searches for piece 2"
+        start = time.perf_counter()
+        game.iterative_deepening(None, max_depth=depth)
+        elapsed = time.perf_counter() - start
+        if game.search_depth < depth:
+            break  # result proven before this depth
+        results.append((depth, elapsed, game.nodes))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=DEPTH)
+    parser.add_argument("--sizes", nargs="+", default=SIZES, help="rows x columns x connect, e.g. 20x20x5")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for rules in map(parse_size, args.sizes):
+        positions = random_positions(rules, POSITIONS, rng)
+        game = Connect4Game(tt_size=1, rules=rules)
+
+        def evaluate(bb):
+            game.bitboard = bb
+            game.evaluate()
+
+        print(f"{rules.rows}x{rules.columns} connect {rules.connect} ({rules.stride * rules.columns}-bit boards)")
+        print(f"  win check, last piece {ops_per_sec(Bitboard.last_move_won, positions):12,.0f} ops/s")
+        print(f"  win check, full board {ops_per_sec(lambda bb: bb.has_won(bb.moves[-1][1]), positions):12,.0f} ops/s")
+        print(f"  evaluate              {ops_per_sec(evaluate, positions):12,.0f} ops/s")
+        for depth, elapsed, nodes in time_to_depth(rules, args.depth):
+            print(f"  depth {depth}  {elapsed * 1000:10.1f} ms {nodes:9d} nodes {nodes / elapsed:10,.0f} nodes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Spectator fan-out throughput of protocol.Broadcaster on loopback.
+
+Connects [subscribers] spectators (plus --stalled ones that never read),
+publishes moves in bursts and waits for every reading spectator to receive
+each burst. Reports moves delivered per second across all spectators and
+the time publish() costs the player. Stalled spectators are only dropped
+once the kernel's socket buffers are full, which takes around a million
+moves on loopback:
+
+    python -m benchmarks.bench_broadcast [subscribers] [--moves 4096] [--stalled 10]
+"""
+import argparse
+import selectors
+import socket
+import threading
+import time
+
+from protocol import HEADER, Broadcaster
+
+
+SUBSCRIBERS = 1000
+MOVES = 4096
+BURST = 64  # moves published before waiting for delivery, below SPECTATOR_BACKLOG
+FRAME_SIZE = HEADER.size + 1  # one MOVE frame
+SNAPSHOT_SIZE = HEADER.size + 1  # empty game: just the version byte
+STALLED_RCVBUF = 4096
+
+
+class Spectators:
+    # Reads every subscriber socket from one selector thread and counts bytes
+    def __init__(self, port, count):
+        self.selector = selectors.DefaultSelector()
+        self.received = {}
+        self.done = threading.Event()
+        for _ in range(count):
+            sock = socket.create_connection(("127.0.0.1", port))
+            sock.setblocking(False)
+            self.received[sock] = 0
+            self.selector.register(sock, selectors.EVENT_READ)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.done.is_set():
+            for key, _ in self.selector.select(0.05):
+                try:
+                    data = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    continue
+                self.received[key.fileobj] += len(data)
+
+    def wait_for(self, total_bytes, timeout=30.0):
+        deadline = time.perf_counter() + timeout
+        while min(self.received.values()) < total_bytes:
+            if time.perf_counter() > deadline:
+                raise RuntimeError("spectators stopped receiving")
+            time.sleep(0.0005)
+
+    def close(self):
+        self.done.set()
+        self.thread.join()
+        for sock in self.received:
+            sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("subscribers", type=int, nargs="?", default=SUBSCRIBERS)
+    parser.add_argument("--moves", type=int, default=MOVES)
+    parser.add_argument("--stalled", type=int, default=0, help="spectators that connect but never read")
+    args = parser.parse_args(argv)
+
+    broadcaster = Broadcaster(port=0, host="127.0.0.1")
+    stalled = []
+    for _ in range(args.stalled):
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, STALLED_RCVBUF)
+        sock.connect(("127.0.0.1", broadcaster.port))
+        stalled.append(sock)
+    spectators = Spectators(broadcaster.port, args.subscribers)
+    while len(broadcaster) < args.subscribers + args.stalled:
+        time.sleep(0.01)
+    spectators.wait_for(SNAPSHOT_SIZE)
+
+    publish_time = 0.0
+    published = 0
+    start = time.perf_counter()
+    while published < args.moves:
+        burst = min(BURST, args.moves - published)
+        t = time.perf_counter()
+        for i in range(burst):
+            broadcaster.publish((published + i) % 7)
+        publish_time += time.perf_counter() - t
+        published += burst
+        spectators.wait_for(SNAPSHOT_SIZE + published * FRAME_SIZE)
+    elapsed = time.perf_counter() - start
+
+    delivered = args.subscribers * args.moves
+    print(f"{args.subscribers} spectators, {args.moves} moves in bursts of {BURST}"
+          + (f", {args.stalled} stalled" if args.stalled else ""))
+    print(f"delivered {delivered} moves in {elapsed:.2f} s: {delivered / elapsed:,.0f} moves/s, "
+          f"{args.moves / elapsed:,.0f} moves/s per spectator")
+    print(f"publish(): {publish_time / args.moves * 1e6:.1f} us per move on the player's thread")
+    if args.stalled:
+        print(f"stalled spectators dropped: {broadcaster.dropped} of {args.stalled}")
+
+    spectators.close()
+    broadcaster.close()
+    for sock in stalled:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
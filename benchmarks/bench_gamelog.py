@@ -0,0 +1,124 @@
+"""Game log throughput: bulk NumPy export/import, random access and replay.
+
+Writes [games] random game records to a temporary log, maps it back,
+unpacks every move sequence and checks the round trip, then replays real
+games through Connect4Game.make_move and compares the boards:
+
+    python -m benchmarks.bench_gamelog [games]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from engine import COLUMN_COUNT, ROW_COUNT, Connect4Game
+from engine.gamelog import (GAME_LOG_HEADER, GAME_MODES, GAME_RECORD_DTYPE, PLAYER_KINDS, GameLog, GameLogWriter,
+                            GameRecord, pack_moves, unpack_moves)
+
+
+GAMES = 1_000_000
+RANDOM_ACCESSES = 100_000
+REPLAYS = 2000
+
+
+def random_fills(n, rng):
+    # (n, ROW_COUNT * COLUMN_COUNT) legal move orders filling the board;
+    # wins are not checked, so these only exercise the format
+    plies = ROW_COUNT * COLUMN_COUNT
+    heights = np.zeros((n, COLUMN_COUNT), dtype=np.int8)
+    moves = np.empty((n, plies), dtype=np.int8)
+    for ply in range(plies):
+        keys = rng.random((n, COLUMN_COUNT))
+        keys[heights >= ROW_COUNT] = -1
+        col = keys.argmax(axis=1)
+        moves[:, ply] = col
+        heights[np.arange(n), col] += 1
+    return moves
+
+
+def random_game():
+    game = Connect4Game(tt_size=1)
+    game.mode = "1v1"
+    while not game.game_over:
+        col = random.choice([c for c in range(COLUMN_COUNT) if game.is_valid_location(c)])
+        game.make_move(col)
+    return game
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("games", type=int, nargs="?", default=GAMES)
+    games = parser.parse_args(argv).games
+    rng = np.random.default_rng(0)
+    moves = random_fills(games, rng)
+    plies = rng.integers(7, ROW_COUNT * COLUMN_COUNT + 1, games)
+    moves[np.arange(moves.shape[1]) >= plies[:, None]] = -1
+
+    records = np.zeros(games, dtype=GAME_RECORD_DTYPE)
+    records["mode"] = GAME_MODES.index("selfplay")
+    records["player1"] = PLAYER_KINDS.index("hard")
+    records["player2"] = PLAYER_KINDS.index("medium")
+    records["result"] = rng.integers(0, 3, games)
+    records["plies"] = plies
+    records["started"] = int(time.time())
+    records["think_ms"] = rng.integers(0, 60000, (games, 2))
+    records["duration_ms"] = records["think_ms"].sum(axis=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "games.c4g")
+        start = time.perf_counter()
+        records["moves"] = pack_moves(moves)
+        pack_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        writer = GameLogWriter(path)
+        writer.append_array(records)
+        writer.close()
+        write_time = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        game_log = GameLog(path)
+        loaded = game_log.to_numpy()
+        unpacked = unpack_moves(loaded)
+        read_time = time.perf_counter() - start
+        assert np.array_equal(unpacked, moves) and np.array_equal(loaded["think_ms"], records["think_ms"])
+
+        indices = rng.integers(0, games, RANDOM_ACCESSES)
+        start = time.perf_counter()
+        for i in indices:
+            record = game_log[int(i)]
+        access_time = time.perf_counter() - start
+        assert record.moves == [int(col) for col in moves[i, :plies[i]]]
+        del loaded
+        game_log.close()
+
+        print(f"{games} games, {size / 2**20:.1f} MiB ({(size - GAME_LOG_HEADER.size) / games:.0f} bytes per game)")
+        print(f"pack moves   {pack_time:6.2f} s  {games / pack_time:12,.0f} games/s")
+        print(f"write        {write_time:6.2f} s  {size / 2**20 / write_time:12,.0f} MiB/s")
+        print(f"map + unpack {read_time:6.2f} s  {games / read_time:12,.0f} games/s")
+        print(f"log[i]       {access_time / RANDOM_ACCESSES * 1e6:6.2f} us per random record")
+
+        # Real games must replay to the same board
+        path = os.path.join(tmp, "replay.c4g")
+        played = [random_game() for _ in range(REPLAYS)]
+        writer = GameLogWriter(path)
+        for game in played:
+            writer.append(GameRecord.from_game(game))
+        writer.close()
+        game_log = GameLog(path)
+        start = time.perf_counter()
+        for i, game in enumerate(played):
+            replayed = game_log[i].replay(Connect4Game(tt_size=1))
+            assert replayed.bitboard.masks == game.bitboard.masks and replayed.winner == game.winner
+        replay_time = time.perf_counter() - start
+        game_log.close()
+        print(f"replay       {replay_time / REPLAYS * 1e6:6.1f} us per game, {REPLAYS} games identical")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,62 @@
+"""Import time of the engine package against the GUI module.
+
+Each module is imported [repeats] times, every time in a fresh interpreter
+so nothing is cached in sys.modules, and the median, fastest and slowest
+imports are reported with the heavy dependencies each one pulled in. Exits
+with status 1 if importing the engine takes longer than TARGET_MS:
+
+    python -m benchmarks.bench_import [repeats]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+REPEATS = 20
+TARGET_MS = 50  # engine import, so pool workers and command line tools start fast
+MODULES = ("engine", "engine.gamelog", "engine.mcts", "script")
+HEAVY = ("numpy", "pygame", "multiprocessing")  # reported when an import loads them
+
+TIMER = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed * 1000, *[name for name in {heavy!r} if name in sys.modules])
+"""
+
+
+def time_import(module, repeats):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    times = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", TIMER.format(module=module, heavy=HEAVY)], cwd=root, env=env,
+                             capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(out[0]))
+        loaded = out[1:]
+    return times, loaded
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("repeats", type=int, nargs="?", default=REPEATS, help="fresh interpreters per module")
+    repeats = parser.parse_args(argv).repeats
+    print(f"import time over {repeats} fresh interpreters")
+    engine_ms = None
+    for module in MODULES:
+        times, loaded = time_import(module, repeats)
+        median = statistics.median(times)
+        if module == "engine":
+            engine_ms = median
+        print(f"  {module:15} median {median:7.1f} ms  min {min(times):7.1f}  max {max(times):7.1f}"
+              f"  loads {', '.join(loaded) or '-'}")
+    if engine_ms > TARGET_MS:
+        print(f"engine import {engine_ms:.1f} ms is over the {TARGET_MS} ms target")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
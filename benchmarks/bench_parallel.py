@@ -0,0 +1,59 @@
+"""Speedup of the parallel root search over the serial one.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parallel [workers] [depth]
+"""
+import argparse
+import os
+import sys
+import time
+
+from engine import CENTER_ORDER, Connect4Game
+from benchmarks.bench_search import POSITIONS
+
+
+DEPTH = 9
+
+
+def search(game, moves, depth):
+    game.reset()
+    for col in moves:
+        game.make_move(col)
+    assert game.bitboard.ply % 2 == 1 and not game.game_over, moves
+    game.nodes = 0
+    root_moves = [col for col in CENTER_ORDER if game.is_valid_location(col)]
+    start = time.perf_counter()
+    scores = game._search_root(root_moves, depth)
+    return time.perf_counter() - start, game.nodes, max(scores.values())
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("workers", type=int, nargs="?", default=os.cpu_count(), help="default: one per cpu")
+    parser.add_argument("depth", type=int, nargs="?", default=DEPTH)
+    args = parser.parse_args(argv)
+    workers, depth = args.workers, args.depth
+    serial = Connect4Game()
+    parallel = Connect4Game()
+    parallel.ai_workers = workers
+    search(parallel, [3], 1)  # start the pool outside the timings
+
+    print(f"depth {depth}, {workers} workers ({os.cpu_count()} cpus)")
+    serial_total = parallel_total = 0.0
+    for name, moves in POSITIONS.items():
+        serial_time, serial_nodes, serial_best = search(serial, moves, depth)
+        parallel_time, parallel_nodes, parallel_best = search(parallel, moves, depth)
+        assert serial_best == parallel_best, name
+        serial_total += serial_time
+        parallel_total += parallel_time
+        print(f"  {name:8} serial {serial_time:7.3f}s {serial_nodes:8d} nodes"
+              f"   parallel {parallel_time:7.3f}s {parallel_nodes:8d} nodes"
+              f"   speedup {serial_time / parallel_time:5.2f}x")
+    print(f"  total    serial {serial_total:7.3f}s   parallel {parallel_total:7.3f}s"
+          f"   speedup {serial_total / parallel_total:5.2f}x")
+    parallel.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,96 @@
+"""Frame time of draw_board: full redraw versus the cached BoardRenderer.
+
+Uses SDL's dummy video driver, so it needs no display:
+
+    python -m benchmarks.bench_render [frames]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+import script
+from engine import COLUMN_COUNT, ROW_COUNT
+from script import (BLUE, LIGHT_BLUE, RADIUS, RED, SQUARESIZE, WHITE, YELLOW, BoardRenderer, GameSession, height, size,
+                    status_text)
+
+
+FRAMES = 600
+MOVE_EVERY = 60  # a piece is dropped once a second at 60 fps
+
+
+def full_redraw(screen, game, mouse_x):
+    # draw_board as it was: everything, every frame
+    screen.fill(BLUE)
+    for c in range(COLUMN_COUNT):
+        for r in range(ROW_COUNT):
+            pygame.draw.rect(screen, LIGHT_BLUE, (c*SQUARESIZE, (r+1)*SQUARESIZE, SQUARESIZE, SQUARESIZE))
+            pygame.draw.circle(screen, WHITE, (int(c*SQUARESIZE+SQUARESIZE/2), int((r+1)*SQUARESIZE+SQUARESIZE/2)), RADIUS)
+    board = game.board
+    for c in range(COLUMN_COUNT):
+        for r in range(ROW_COUNT):
+            if board[r][c]:
+                color = RED if board[r][c] == 1 else YELLOW
+                pygame.draw.circle(screen, color, (int(c*SQUARESIZE+SQUARESIZE/2), height-int(r*SQUARESIZE+SQUARESIZE/2)), RADIUS)
+    if game.turn == 0 or game.mode == "1v1":
+        pygame.draw.circle(screen, RED if game.turn == 0 else YELLOW, (mouse_x, int(SQUARESIZE/2)), RADIUS)
+    text_font, text, color = status_text(game)
+    surface = text_font.render(text, True, color)
+    screen.blit(surface, (script.width//2 - surface.get_width()//2, 10))
+    pygame.display.update()
+
+
+def run(screen, draw, frames, hover):
+    game = GameSession()
+    game.mode = "1v1"
+    moves = [3, 3, 2, 4, 4, 2, 5, 1, 0, 6, 6, 0, 1, 5, 3, 3, 2, 2, 4, 4]
+    times = []
+    for frame in range(frames):
+        if frame % MOVE_EVERY == 0 and moves:
+            game.make_move(moves.pop(0))
+        mouse_x = (frame * 7) % script.width if hover else 350
+        start = time.perf_counter()
+        draw(screen, game, mouse_x)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return sum(times) / len(times) * 1000, times[len(times) * 99 // 100] * 1000
+
+
+def same_pixels(screen):
+    game = GameSession()
+    game.mode = "1v1"
+    for col in [3, 3, 2, 4, 1]:
+        game.make_move(col)
+    renderer = BoardRenderer()
+    renderer.draw(screen, game, 123)
+    game.make_move(5)
+    renderer.draw(screen, game, 456)
+    cached = pygame.surfarray.array3d(screen)
+    full_redraw(screen, game, 456)
+    return (cached == pygame.surfarray.array3d(screen)).all()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("frames", type=int, nargs="?", default=FRAMES)
+    frames = parser.parse_args(argv).frames
+    script.init_display()
+    screen = pygame.display.set_mode(size)
+    assert same_pixels(screen), "cached renderer differs from a full redraw"
+
+    print(f"{frames} frames, one move every {MOVE_EVERY} frames")
+    for hover, label in ((False, "mouse still"), (True, "mouse moving")):
+        full_avg, full_p99 = run(screen, full_redraw, frames, hover)
+        renderer = BoardRenderer()
+        cached_avg, cached_p99 = run(screen, renderer.draw, frames, hover)
+        print(f"  {label:13} full redraw {full_avg:6.3f} ms (p99 {full_p99:6.3f})"
+              f"   cached {cached_avg:6.3f} ms (p99 {cached_p99:6.3f})   {full_avg / cached_avg:5.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
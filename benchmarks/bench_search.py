@@ -0,0 +1,107 @@
+"""Node counts of minimax at equal depth, with and without move ordering.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search [depth ...]
+"""
+import argparse
+import sys
+import time
+
+from engine import COLUMN_COUNT, CENTER_ORDER, Connect4Game
+
+
+# Odd plies, so piece 2 is to move as _search_root assumes
+POSITIONS = {
+    "opening": [3],
+    "early": [3, 2, 3, 3, 4, 1, 2],
+    "midgame": [3, 3, 3, 2, 4, 4, 2, 5, 1, 3, 2, 0, 4],
+    "late": [3, 3, 3, 3, 2, 4, 4, 2, 2, 5, 5, 1, 6, 1, 0, 3, 4, 2, 3, 2, 2],
+}
+DEPTHS = (4, 6)
+
+
+class NoTable:
+    def new_search(self):
+        pass
+
+    def probe(self, key):
+        return None
+
+    def store(self, key, depth, flag, value, best_move):
+        pass
+
+
+class LegacyGame(Connect4Game):
+    # minimax as it was before the heuristic: every quiet leaf scores 0 and
+    # columns are tried left to right, without a transposition table
+    def __init__(self):
+        super().__init__()
+        self.tt = NoTable()
+
+    def evaluate(self):
+        return 0
+
+    def order_moves(self, moves, ply, player, tt_move):
+        moves.sort()
+
+    def record_cutoff(self, ply, player, col, depth):
+        pass
+
+
+class UnorderedGame(LegacyGame):
+    # Same heuristic as Connect4Game, left-to-right order
+    evaluate = Connect4Game.evaluate
+
+
+class OrderedGame(Connect4Game):
+    # Center-out, killer and history ordering, no transposition table
+    def __init__(self):
+        super().__init__()
+        self.tt = NoTable()
+
+
+VARIANTS = (
+    ("legacy: zero eval, left-to-right", LegacyGame, False),
+    ("heuristic, left-to-right", UnorderedGame, False),
+    ("heuristic, ordered", OrderedGame, True),
+    ("heuristic, ordered + table", Connect4Game, True),
+)
+
+
+def count_nodes(game_class, moves, depth, center_out):
+    game = game_class()
+    for col in moves:
+        game.make_move(col)
+    assert game.bitboard.ply % 2 == 1 and not game.game_over, moves
+    root = CENTER_ORDER if center_out else range(COLUMN_COUNT)
+    root_moves = [col for col in root if game.is_valid_location(col)]
+    start = time.perf_counter()
+    scores = game._search_root(root_moves, depth)
+    elapsed = time.perf_counter() - start
+    best = max(root_moves, key=lambda col: scores[col])
+    return game.nodes, elapsed, best
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("depths", type=int, nargs="*", default=DEPTHS, help=f"search depths (default: {DEPTHS})")
+    args = parser.parse_args(argv)
+    for depth in args.depths:
+        print(f"depth {depth}")
+        baseline = None
+        for label, game_class, center_out in VARIANTS:
+            total_nodes = 0
+            total_time = 0.0
+            for moves in POSITIONS.values():
+                nodes, elapsed, _ = count_nodes(game_class, moves, depth, center_out)
+                total_nodes += nodes
+                total_time += elapsed
+            if game_class is UnorderedGame:
+                baseline = total_nodes
+            ratio = f"{baseline / total_nodes:6.1f}x fewer" if baseline else ""
+            print(f"  {label:36} {total_nodes:9d} nodes {total_time:8.3f}s  {ratio}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
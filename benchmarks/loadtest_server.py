@@ -0,0 +1,218 @@
+"""Load test of server.py with simulated clients.
+
+Starts the match server in a subprocess, connects --clients bots that play
+random legal moves with a think time and queue for a new game as soon as
+one ends until --seconds are up, and reports how many games ran at once, the move relay latency
+(mover sends -> opponent receives) and the server's memory per game:
+
+    python -m benchmarks.loadtest_server [--clients 2000] [--seconds 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from protocol import (
+    HEADER, MSG_ACK, MSG_BYE, MSG_HELLO, MSG_JOIN, MSG_MOVE, MSG_PING, MSG_PONG,
+    MSG_REJECT, MSG_START, PROTOCOL_VERSION, START_PAYLOAD, encode_frame,
+)
+from engine import COLUMN_COUNT, Connect4Game
+
+
+CLIENTS = 1000
+SECONDS = 20.0
+THINK_MS = 200  # mean time a bot waits before moving
+CONNECT_BATCH = 200  # clients connecting per ramp step
+SAMPLE_SECONDS = 0.5
+
+
+class LoadStats:
+    def __init__(self):
+        self.sent = {}  # (match id, ply) -> perf_counter when the mover sent it
+        self.latencies = []
+        self.in_game = 0
+        self.concurrent = []  # sampled number of running games
+        self.games = 0
+        self.rejected = 0
+        self.errors = 0
+
+
+class Bot:
+    def __init__(self, stats, think_s):
+        self.stats = stats
+        self.think_s = think_s
+        self.send_seq = 0
+        self.game = None
+        self.match_id = None
+
+    def send(self, writer, msg_type, payload=b""):
+        writer.write(encode_frame(msg_type, self.send_seq, payload))
+        self.send_seq += 1
+
+    async def run(self, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            self.send(writer, MSG_HELLO, bytes([PROTOCOL_VERSION]))
+            self.send(writer, MSG_JOIN)
+            while True:
+                length, msg_type, seq = HEADER.unpack(await reader.readexactly(HEADER.size))
+                payload = await reader.readexactly(length) if length else b""
+                if msg_type == MSG_START:
+                    side, self.match_id = START_PAYLOAD.unpack(payload)
+                    self.game = Connect4Game(tt_size=1)
+                    self.stats.in_game += 1
+                    if side == 0:
+                        await self.move(writer)
+                elif msg_type == MSG_MOVE:
+                    sent = self.stats.sent.pop((self.match_id, self.game.bitboard.ply), None)
+                    if sent is not None:
+                        self.stats.latencies.append(time.perf_counter() - sent)
+                    self.send(writer, MSG_ACK, struct.pack("<I", seq))
+                    self.game.make_move(payload[0])
+                    if self.game.game_over:
+                        self.finish(writer, side=1)
+                    else:
+                        await self.move(writer)
+                elif msg_type == MSG_REJECT:
+                    self.stats.rejected += 1
+                elif msg_type == MSG_PING:
+                    self.send(writer, MSG_PONG, payload)
+                elif msg_type == MSG_BYE:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.stats.errors += 1
+        finally:
+            writer.close()
+
+    async def move(self, writer):
+        await asyncio.sleep(random.expovariate(1 / self.think_s))
+        col = random.choice([c for c in range(COLUMN_COUNT) if self.game.is_valid_location(c)])
+        self.stats.sent[(self.match_id, self.game.bitboard.ply)] = time.perf_counter()
+        self.send(writer, MSG_MOVE, bytes([col]))
+        self.game.make_move(col)
+        if self.game.game_over:
+            self.finish(writer, side=0)
+
+    def finish(self, writer, side):
+        # Only the mover of the last move counts the game, so it is counted once
+        if side == 0:
+            self.stats.games += 1
+        self.stats.in_game -= 1
+        self.game = None
+        self.send(writer, MSG_JOIN)
+
+
+def server_rss(pid):
+    # Resident memory in bytes, from /proc (Linux only)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+async def wait_for_server(host, port):
+    for _ in range(200):
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+async def load(args, server):
+    stats = LoadStats()
+    await wait_for_server(args.host, args.port)
+    rss_idle = server_rss(server.pid)
+    stop_at = time.perf_counter() + args.seconds
+    tasks = []
+    for start in range(0, args.clients, CONNECT_BATCH):
+        for _ in range(min(CONNECT_BATCH, args.clients - start)):
+            bot = Bot(stats, args.think_ms / 1000)
+            tasks.append(asyncio.create_task(bot.run(args.host, args.port)))
+        await asyncio.sleep(0.05)
+
+    rss_peak, games_at_peak = rss_idle, 0
+    while time.perf_counter() < stop_at:
+        await asyncio.sleep(SAMPLE_SECONDS)
+        stats.concurrent.append(stats.in_game // 2)
+        rss = server_rss(server.pid)
+        if rss is not None and stats.in_game // 2 >= games_at_peak:
+            rss_peak, games_at_peak = rss, stats.in_game // 2
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return stats, rss_idle, rss_peak, games_at_peak
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=CLIENTS)
+    parser.add_argument("--seconds", type=float, default=SECONDS)
+    parser.add_argument("--think-ms", type=float, default=THINK_MS)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="default: any free port")
+    parser.add_argument("--json", action="store_true", help="print the results as one JSON object")
+    args = parser.parse_args(argv)
+    if args.port is None:
+        with socket.socket() as sock:
+            sock.bind((args.host, 0))
+            args.port = sock.getsockname()[1]
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen([sys.executable, os.path.join(root, "server.py"), "--host", args.host,
+                               "--port", str(args.port)], stderr=subprocess.DEVNULL)
+    try:
+        stats, rss_idle, rss_peak, games_at_peak = asyncio.run(load(args, server))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    latencies = np.array(stats.latencies) * 1000
+    concurrent = stats.concurrent[len(stats.concurrent) // 4:]  # skip the ramp
+    result = {
+        "clients": args.clients,
+        "games_finished": stats.games,
+        "concurrent_games_avg": round(float(np.mean(concurrent)), 1) if concurrent else 0,
+        "concurrent_games_peak": max(stats.concurrent, default=0),
+        "moves": len(latencies),
+        "moves_per_s": round(len(latencies) / args.seconds, 1),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+        "latency_p99_ms": round(float(np.percentile(latencies, 99)), 2) if len(latencies) else None,
+        "server_bytes_per_game": (rss_peak - rss_idle) // games_at_peak
+                                 if rss_idle is not None and games_at_peak else None,
+        "rejected": stats.rejected,
+        "errors": stats.errors,
+    }
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(f"{args.clients} clients for {args.seconds:g}s, think {args.think_ms:g} ms")
+    print(f"games: {result['concurrent_games_avg']} concurrent on average, {result['concurrent_games_peak']} peak, "
+          f"{stats.games} finished")
+    print(f"moves: {result['moves']} ({result['moves_per_s']}/s), relay latency "
+          f"p50 {result['latency_p50_ms']} ms, p99 {result['latency_p99_ms']} ms")
+    if result["server_bytes_per_game"] is not None:
+        print(f"server memory: {result['server_bytes_per_game'] / 1024:.1f} KiB per game "
+              f"({games_at_peak} games, {(rss_peak - rss_idle) / 2**20:.1f} MiB over idle)")
+    if stats.rejected or stats.errors:
+        print(f"rejected moves: {stats.rejected}, connection errors: {stats.errors}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,216 @@
+"""Benchmarks for the engine hot paths on the reference positions.
+
+Measures ops/sec of the board primitives and, for search, nodes/sec,
+the time to complete each depth and MCTS playouts/sec. Needs no display. Save results as JSON
+and compare two runs, e.g. before and after a change:
+
+    python -m benchmarks.run --json after.json
+    python -m benchmarks.run --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from engine import AI_TIME_BUDGET_MS, CENTER_ORDER, COLUMN_COUNT, ROW_COUNT, Connect4Game
+
+
+POSITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "positions.json")
+MIN_SECONDS = 0.2  # per primitive measurement
+MINIMAX_DEPTH = 6
+MAX_DEPTH = 8  # time-to-depth goes up to this
+
+
+def load_positions():
+    with open(POSITIONS_PATH) as f:
+        return json.load(f)
+
+
+def game_at(moves):
+    # Book and tablebase off: they only exist where they were built, and
+    # results must compare across machines
+    game = Connect4Game()
+    game.opening_book = None
+    game.tablebase = None
+    for col in moves:
+        game.make_move(col)
+    return game
+
+
+def ops_per_sec(fn, calls=1):
+    # fn does `calls` operations per invocation
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for _ in range(100):
+            fn()
+        count += 100
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return count * calls / elapsed
+
+
+def bench_primitives(game):
+    results = {
+        "winning_move": ops_per_sec(lambda: (game.winning_move(1), game.winning_move(2)), calls=2),
+        "get_next_open_row": ops_per_sec(lambda: [game.get_next_open_row(col) for col in range(COLUMN_COUNT)],
+                                         calls=COLUMN_COUNT),
+    }
+    if not game.game_over:
+        col = next(col for col in CENTER_ORDER if game.is_valid_location(col))
+
+        def make_and_undo():
+            game.make_move(col)
+            game.bitboard.undo()
+            game.turn = (game.turn + 1) % 2
+            game.game_over = False
+            game.winner = None
+
+        results["make_move"] = ops_per_sec(make_and_undo)
+    return results
+
+
+def bench_minimax(moves, depth):
+    game = game_at(moves)
+    root_moves = [col for col in CENTER_ORDER if game.is_valid_location(col)]
+    start = time.perf_counter()
+    game._search_root(root_moves, depth)
+    elapsed = time.perf_counter() - start
+    return {"depth": depth, "nodes": game.nodes, "seconds": elapsed, "nps": game.nodes / elapsed}
+
+
+def bench_time_to_depth(moves, max_depth):
+    # Fresh search (empty table) for each target depth
+    results = []
+    for depth in range(1, max_depth + 1):
+        game = game_at(moves)
+        start = time.perf_counter()
+        game.iterative_deepening(None, max_depth=depth)
+        elapsed = time.perf_counter() - start
+        if game.search_depth < depth:
+            break  # result proven before this depth
+        results.append({"depth": depth, "seconds": elapsed, "nodes": game.nodes, "nps": game.nodes / elapsed})
+    return results
+
+
+def bench_hard_ai(moves, budget_ms):
+    game = game_at(moves)
+    game.ai_time_budget_ms = budget_ms
+    start = time.perf_counter()
+    game.hard_ai()
+    elapsed = time.perf_counter() - start
+    return {"budget_ms": budget_ms, "depth": game.search_depth, "nodes": game.nodes,
+            "seconds": elapsed, "nps": game.nodes / elapsed}
+
+
+def bench_mcts(moves, budget_ms):
+    game = game_at(moves)
+    game.mcts_move(budget_ms)
+    stats = game.last_search
+    return {"budget_ms": budget_ms, "nodes": stats.nodes, "playouts": stats.playouts, "seconds": stats.elapsed,
+            "nps": stats.nps, "playouts_per_sec": stats.playouts_per_sec}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(POSITIONS_PATH))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "positions": {},
+    }
+    for name, moves in load_positions().items():
+        game = game_at(moves)
+        entry = {"plies": len(moves), "primitives": bench_primitives(game_at(moves))}
+        if not game.game_over:
+            depth = min(args.depth, ROW_COUNT * COLUMN_COUNT - len(moves))
+            entry["minimax"] = bench_minimax(moves, min(MINIMAX_DEPTH, depth))
+            entry["time_to_depth"] = bench_time_to_depth(moves, depth)
+            entry["hard_ai"] = bench_hard_ai(moves, args.budget_ms)
+            entry["mcts"] = bench_mcts(moves, args.budget_ms)
+        results["positions"][name] = entry
+        print_position(name, entry)
+    return results
+
+
+def print_position(name, entry):
+    print(f"{name} ({entry['plies']} plies)")
+    for op, rate in entry["primitives"].items():
+        print(f"  {op:20} {rate:14,.0f} ops/s")
+    if "minimax" in entry:
+        m = entry["minimax"]
+        print(f"  {'minimax':20} {m['nps']:14,.0f} nodes/s  (depth {m['depth']}, {m['nodes']} nodes)")
+        h = entry["hard_ai"]
+        print(f"  {'hard_ai':20} {h['nps']:14,.0f} nodes/s  (depth {h['depth']} in {h['seconds'] * 1000:.0f} ms)")
+        if "mcts" in entry:
+            m = entry["mcts"]
+            print(f"  {'mcts':20} {m['playouts_per_sec']:14,.0f} playouts/s  ({m['nps']:,.0f} nodes/s)")
+        depths = "  ".join(f"d{t['depth']} {t['seconds'] * 1000:.1f}ms" for t in entry["time_to_depth"])
+        print(f"  {'time to depth':20} {depths}")
+
+
+def flatten(results):
+    # {"position/metric": value} for every number worth comparing
+    flat = {}
+    for name, entry in results["positions"].items():
+        for op, rate in entry["primitives"].items():
+            flat[f"{name}/{op} ops/s"] = rate
+        if "minimax" in entry:
+            flat[f"{name}/minimax nodes/s"] = entry["minimax"]["nps"]
+            flat[f"{name}/hard_ai nodes/s"] = entry["hard_ai"]["nps"]
+            flat[f"{name}/hard_ai depth"] = entry["hard_ai"]["depth"]
+            if "mcts" in entry:
+                flat[f"{name}/mcts playouts/s"] = entry["mcts"]["playouts_per_sec"]
+                flat[f"{name}/mcts nodes/s"] = entry["mcts"]["nps"]
+            for t in entry["time_to_depth"]:
+                flat[f"{name}/depth {t['depth']} ms"] = t["seconds"] * 1000
+    return flat
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"before {before['meta'].get('commit')}  after {after['meta'].get('commit')}")
+    old, new = flatten(before), flatten(after)
+    for metric in old:
+        if metric in new and old[metric]:
+            change = (new[metric] - old[metric]) / old[metric]
+            print(f"  {metric:40} {old[metric]:14,.1f} {new[metric]:14,.1f} {change:+8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--depth", type=int, default=MAX_DEPTH, help="deepest time-to-depth measurement")
+    parser.add_argument("--budget-ms", type=int, default=AI_TIME_BUDGET_MS, help="hard_ai time per move")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    results = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Builds the opening book read by Connect4Game.
+
+Every position the AI (second player) can face in the first --plies moves
+is deep-searched once and its best move written to a sorted binary file:
+
+    python build_book.py --plies 5 --depth 12 --out opening_book.bin
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import (BOOK_HEADER, BOOK_MAGIC, BOOK_RECORD, BOOK_VERSION, BOOK_WIN, COLUMN_COUNT, OPENING_BOOK_PATH,
+                    ROW_COUNT, WIN_SCORE, Bitboard, Connect4Game)
+
+
+def book_positions(plies):
+    # Canonical positions with the AI to move (odd ply) up to `plies` pieces,
+    # skipping finished games. Returns {canonical key: position}.
+    found = {}
+    frontier = {Bitboard().canonical_key()[0]: Bitboard()}
+    for ply in range(plies):
+        player = ply % 2
+        next_frontier = {}
+        for bb in frontier.values():
+            for col in range(COLUMN_COUNT):
+                if not bb.can_play(col):
+                    continue
+                child = bb.copy()
+                child.play(col, player)
+                if child.has_won(player) or child.is_full():
+                    continue
+                key = child.canonical_key()[0]
+                if key not in next_frontier:
+                    next_frontier[key] = child
+        frontier = next_frontier
+        if player == 0:
+            found.update((key, bb.position()) for key, bb in frontier.items())
+    return found
+
+
+_engine = None
+
+
+def solve(position, depth):
+    global _engine
+    if _engine is None:
+        _engine = Connect4Game()
+        _engine.opening_book = None
+    _engine.bitboard = Bitboard.from_position(position)
+    col = _engine.iterative_deepening(None, max_depth=depth)
+    key, mirrored = _engine.bitboard.canonical_key()
+    if mirrored:
+        col = COLUMN_COUNT - 1 - col
+    score = _engine.search_score
+    if abs(score) >= WIN_SCORE:
+        score = BOOK_WIN if score > 0 else -BOOK_WIN
+    else:
+        score = max(1 - BOOK_WIN, min(BOOK_WIN - 1, score))
+    return key, col, _engine.search_depth, score
+
+
+def write_book(path, plies, records):
+    records.sort()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, ROW_COUNT, COLUMN_COUNT, plies, len(records)))
+        for record in records:
+            f.write(BOOK_RECORD.pack(*record))
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plies", type=int, default=5, help="deepest position in the book, in pieces on the board")
+    parser.add_argument("--depth", type=int, default=12, help="search depth per position")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default=OPENING_BOOK_PATH)
+    args = parser.parse_args()
+
+    positions = book_positions(args.plies)
+    print(f"{len(positions)} positions up to {args.plies} plies, searching to depth {args.depth}")
+    start = time.perf_counter()
+    records = []
+    with ProcessPoolExecutor(args.workers) as pool:
+        for i, record in enumerate(pool.map(solve, positions.values(), [args.depth] * len(positions), chunksize=16), 1):
+            records.append(record)
+            if i % 500 == 0 or i == len(positions):
+                print(f"  {i}/{len(positions)} ({time.perf_counter() - start:.0f}s)")
+    write_book(args.out, args.plies, records)
+    print(f"wrote {args.out}: {len(records)} records, {os.path.getsize(args.out)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Builds the endgame tablebase read by Connect4Game.
+
+Every 6x7 position with --empty or fewer empty cells is far too many to
+enumerate (the colorings of 34 or more pieces run into the billions), so
+the tablebase covers the endgames games actually reach. Seed positions
+are taken from recorded games (--log) and from --games games in which
+each side wins or blocks a win when it can and otherwise plays at random.
+Every position reachable from a seed is then solved exhaustively, with
+the plies to the end of the game under best play, and written to a
+sorted binary file:
+
+    python build_tablebase.py --empty 8 --games 20000 --out endgame_tablebase.bin
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from engine import (COLUMN_COUNT, ROW_COUNT, TABLEBASE_HEADER, TABLEBASE_MAGIC, TABLEBASE_PATH, TABLEBASE_VERSION,
+                    TB_DRAW, TB_WIN, Bitboard)
+from engine.gamelog import GAME_LOG_PATH, GameLog
+
+
+SEED_CHUNK = 64  # seeds per pool task
+
+
+def seeds_from_log(path, empty):
+    # (position, player to move) of every logged game when it first has
+    # `empty` empty cells, if it got that far
+    seeds = []
+    game_log = GameLog(path)
+    for i in range(len(game_log)):
+        bb = Bitboard()
+        for col in game_log[i].moves:
+            bb.play(col, bb.ply % 2)
+            if bb.last_move_won():
+                break
+            if ROW_COUNT * COLUMN_COUNT - bb.ply == empty:
+                seeds.append((bb.position(), bb.ply % 2))
+                break
+    game_log.close()
+    return seeds
+
+
+def seed_from_game(rng, empty):
+    # Plays until `empty` cells are left: a winning move if there is one,
+    # else a block of the opponent's, else a random column. Returns None if
+    # the game ended first.
+    bb = Bitboard()
+    while ROW_COUNT * COLUMN_COUNT - bb.ply > empty:
+        player = bb.ply % 2
+        moves = [col for col in range(COLUMN_COUNT) if bb.can_play(col)]
+        col = None
+        for side in (player, 1 - player):
+            for move in moves:
+                bb.play(move, side)
+                won = bb.last_move_won()
+                bb.undo()
+                if won:
+                    col = move
+                    break
+            if col is not None:
+                break
+        if col is None:
+            col = rng.choice(moves)
+        bb.play(col, player)
+        if bb.last_move_won():
+            return None
+    return bb.position(), bb.ply % 2
+
+
+# Exhaustive solver, run inside pool processes. Each process keeps the
+# results it has found, so positions shared by several seeds are solved once.
+_table = {}  # canonical key from the side to move -> result << 6 | plies
+_found = []  # (key, packed) found by the running task
+
+
+def solve(bb, player):
+    # (result, plies to the end) for `player` to move on an unfinished board
+    key = bb.canonical_key(player)[0]
+    packed = _table.get(key)
+    if packed is not None:
+        return packed >> 6, packed & 63
+    best = None
+    for col in range(COLUMN_COUNT):
+        if not bb.can_play(col):
+            continue
+        bb.play(col, player)
+        if bb.last_move_won():
+            result, plies = TB_WIN, 1
+        elif bb.is_full():
+            result, plies = TB_DRAW, 1
+        else:
+            result, plies = solve(bb, 1 - player)
+            result, plies = TB_WIN - result, plies + 1
+        bb.undo()
+        # Fastest win, then a draw, then the slowest loss
+        rank = (result, -plies if result == TB_WIN else plies)
+        if best is None or rank > best[0]:
+            best = (rank, result, plies)
+        if result == TB_WIN and plies == 1:
+            break
+    _, result, plies = best
+    packed = result << 6 | plies
+    _table[key] = packed
+    _found.append((key, packed))
+    return result, plies
+
+
+def solve_seeds(seeds):
+    for position, player in seeds:
+        solve(Bitboard.from_position(position), player)
+    found = _found[:]
+    _found.clear()
+    return found
+
+
+def write_tablebase(path, empty, table):
+    records = np.array(sorted(key << 8 | packed for key, packed in table.items()), dtype="<u8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(TABLEBASE_HEADER.pack(TABLEBASE_MAGIC, TABLEBASE_VERSION, ROW_COUNT, COLUMN_COUNT, empty, len(records)))
+        f.write(records.tobytes())
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--empty", type=int, default=8, help="most empty cells in a tablebase position")
+    parser.add_argument("--games", type=int, default=20000, help="seed games to play")
+    parser.add_argument("--log", default=GAME_LOG_PATH, help="game log to take seeds from, if it exists")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default=TABLEBASE_PATH)
+    args = parser.parse_args()
+    if not 1 <= args.empty < ROW_COUNT * COLUMN_COUNT:
+        parser.error(f"--empty must be between 1 and {ROW_COUNT * COLUMN_COUNT - 1}")
+
+    start = time.perf_counter()
+    seeds = seeds_from_log(args.log, args.empty) if os.path.exists(args.log) else []
+    logged = len(seeds)
+    rng = random.Random(args.seed)
+    for _ in range(args.games):
+        seed = seed_from_game(rng, args.empty)
+        if seed is not None:
+            seeds.append(seed)
+    seeds = list(dict.fromkeys(seeds))
+    print(f"{len(seeds)} seed positions with {args.empty} empty cells ({logged} from the game log)")
+
+    table = {}
+    chunks = [seeds[i:i + SEED_CHUNK] for i in range(0, len(seeds), SEED_CHUNK)]
+    with ProcessPoolExecutor(args.workers) as pool:
+        for i, found in enumerate(pool.map(solve_seeds, chunks), 1):
+            table.update(found)
+            if i % 50 == 0 or i == len(chunks):
+                print(f"  {i}/{len(chunks)} chunks, {len(table)} positions ({time.perf_counter() - start:.0f}s)")
+    write_tablebase(args.out, args.empty, table)
+    print(f"wrote {args.out}: {len(table)} positions, {os.path.getsize(args.out)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""Connect four rules and AI, without the GUI.
+
+Importing the package loads neither pygame nor NumPy, so pool workers and
+command line tools start fast. The NumPy-backed parts are imported from
+their modules when needed:
+
+    engine.gamelog  GameRecord, GameLog, GameLogWriter, pack_moves, unpack_moves
+    engine.batch    analyze_boards
+    engine.mcts     MonteCarloSearch, random_playouts
+
+Import time is measured by `python -m benchmarks.bench_import`.
+"""
+from .board import CENTER_ORDER, COLUMN_COUNT, CONNECT, DEFAULT_RULES, ROW_COUNT, Bitboard, Rules
+from .game import (AI_LEVELS, AI_TIME_BUDGET_MS, AI_TIME_BUDGETS, AI_WORKERS, CENTER_WEIGHT, MCTS_PLAYOUTS, MCTS_RAVE,
+                   THREE_WEIGHT, TWO_WEIGHT, WIN_SCORE, Connect4Game)
+from .stats import SearchStats, SearchTimeout
+from .tables import (BOOK_HEADER, BOOK_MAGIC, BOOK_RECORD, BOOK_VERSION, BOOK_WIN, OPENING_BOOK_PATH, TABLEBASE_HEADER,
+                     TABLEBASE_MAGIC, TABLEBASE_PATH, TABLEBASE_VERSION, TB_DRAW, TB_LOSS, TB_WIN, TT_SIZE, OpeningBook,
+                     Tablebase, TranspositionTable, default_opening_book, default_tablebase)
@@ -0,0 +1,56 @@
+"""Vectorized win, draw and evaluation checks over many stored boards."""
+import numpy as np
+
+from .board import COLUMN_COUNT, ROW_COUNT
+from .game import CENTER_WEIGHT, THREE_WEIGHT, TWO_WEIGHT
+
+
+# Batched analysis of stored positions. Cells are encoded so that the sum
+# over a four-cell window is n1 + 5 * n2 (n1, n2 = pieces of piece 1 and 2),
+# which tells both players' counts from a single sum.
+BATCH_CELL_CODES = np.array([0, 1, 5], dtype=np.int8)
+BATCH_CHUNK = 65536  # boards per vectorized pass, bounds temporary memory
+
+
+def _window_sums(codes):
+    # (n, 69) sums over every four-cell window of (n, ROW_COUNT, COLUMN_COUNT) codes
+    R, C = ROW_COUNT, COLUMN_COUNT
+    horizontal = sum(codes[:, :, i:C-3+i] for i in range(4))
+    vertical = sum(codes[:, i:R-3+i, :] for i in range(4))
+    diagonal = sum(codes[:, i:R-3+i, i:C-3+i] for i in range(4))
+    anti_diagonal = sum(codes[:, 3-i:R-i, i:C-3+i] for i in range(4))
+    n = len(codes)
+    return np.concatenate([w.reshape(n, -1) for w in (horizontal, vertical, diagonal, anti_diagonal)], axis=1)
+
+
+def analyze_boards(boards):
+    # For an (N, ROW_COUNT, COLUMN_COUNT) array of 0/1/2 boards returns
+    # (winner, draw, score), each of shape (N,):
+    #   winner: 0 none, 1 or 2 the piece with four in a row (3 if both,
+    #           which cannot happen in a real game); matches winning_move
+    #   draw:   board full and nobody has four
+    #   score:  Connect4Game.evaluate() for the board
+    boards = np.asarray(boards)
+    if boards.ndim != 3 or boards.shape[1:] != (ROW_COUNT, COLUMN_COUNT):
+        raise ValueError(f"expected shape (N, {ROW_COUNT}, {COLUMN_COUNT}), got {boards.shape}")
+    n = len(boards)
+    winner = np.zeros(n, dtype=np.int8)
+    draw = np.zeros(n, dtype=bool)
+    score = np.zeros(n, dtype=np.int32)
+    for start in range(0, n, BATCH_CHUNK):
+        chunk = boards[start:start + BATCH_CHUNK]
+        sums = _window_sums(BATCH_CELL_CODES[chunk])
+        four1 = (sums == 4).any(axis=1)
+        four2 = (sums == 20).any(axis=1)
+        winner[start:start + len(chunk)] = four1 + 2 * four2
+        draw[start:start + len(chunk)] = (chunk != 0).all(axis=(1, 2)) & ~four1 & ~four2
+
+        center = chunk[:, :, COLUMN_COUNT // 2]
+        chunk_score = np.zeros(len(chunk), dtype=np.int32)
+        for piece, sign, one in ((2, 1, 5), (1, -1, 1)):
+            threes = (sums == 3 * one).sum(axis=1)
+            twos = (sums == 2 * one).sum(axis=1)
+            centers = (center == piece).sum(axis=1)
+            chunk_score += sign * (THREE_WEIGHT * threes + TWO_WEIGHT * twos + CENTER_WEIGHT * centers)
+        score[start:start + len(chunk)] = chunk_score
+    return winner, draw, score
@@ -0,0 +1,249 @@
+"""Board geometry and the bitboard the rules are played on."""
+
+ROW_COUNT = 6
+COLUMN_COUNT = 7
+CONNECT = 4  # pieces in a row that win
+CENTER_ORDER = sorted(range(COLUMN_COUNT), key=lambda c: abs(c - COLUMN_COUNT // 2))
+
+
+class Rules:
+    # Board size and win length of a game, with the bitboard masks derived
+    # from them. Bitboard layout: column c owns bits c*stride .. c*stride+rows-1
+    # (bottom row first), plus one always-empty guard bit on top of each
+    # column so that shifts in the win check never wrap from one column into
+    # the next. Masks are plain Python ints, which grow as needed, so a 20x20
+    # board is one 420-bit int rather than an array of 64-bit words.
+    def __init__(self, rows=ROW_COUNT, columns=COLUMN_COUNT, connect=CONNECT):
+        if rows < 1 or columns < 1 or not 2 <= connect <= max(rows, columns):
+            raise ValueError(f"no connect-{connect} game on a {rows}x{columns} board")
+        self.rows = rows
+        self.columns = columns
+        self.connect = connect
+        self.cells = rows * columns
+        self.stride = rows + 1
+        self.win_shifts = (1, self.stride, self.stride - 1, self.stride + 1)  # vertical, horizontal, both diagonals
+        # Per direction, the shifts that reduce a mask to the cells starting
+        # `connect` in a row: runs double in length (1, 2, 4...) and the last
+        # step tops them up, so the check costs O(log connect) shifts
+        self.run_shifts = []
+        for shift in self.win_shifts:
+            steps, length = [], 1
+            while 2 * length <= connect:
+                steps.append(length * shift)
+                length *= 2
+            if length < connect:
+                steps.append((connect - length) * shift)
+            self.run_shifts.append(tuple(steps))
+        self.bottom_mask = sum(1 << (c * self.stride) for c in range(columns))
+        self.column_mask = (1 << self.stride) - 1
+        self.board_mask = self.bottom_mask * ((1 << rows) - 1)  # every playable cell, no guard bits
+        self.center_mask = ((1 << rows) - 1) << (columns // 2 * self.stride)
+        self.center_order = sorted(range(columns), key=lambda c: abs(c - columns // 2))
+
+    def __eq__(self, other):
+        return isinstance(other, Rules) and self.size == other.size
+
+    def __hash__(self):
+        return hash(self.size)
+
+    def __repr__(self):
+        return f"Rules({self.rows}, {self.columns}, {self.connect})"
+
+    @property
+    def size(self):
+        return self.rows, self.columns, self.connect
+
+
+DEFAULT_RULES = Rules()
+
+
+class Bitboard:
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = rules
+        self.masks = [0, 0]  # one mask per player, index = piece - 1
+        self.heights = [0] * rules.columns  # pieces currently in each column
+        self.moves = []  # (col, player) in play order, used by undo()
+        self.ply = 0  # pieces on the board
+
+    def copy(self):
+        other = Bitboard(self.rules)
+        other.masks = self.masks[:]
+        other.heights = self.heights[:]
+        other.moves = self.moves[:]
+        other.ply = self.ply
+        return other
+
+    def position(self):
+        # Compact, picklable form: the two masks. Move history is not kept.
+        return tuple(self.masks)
+
+    @classmethod
+    def from_position(cls, position, rules=DEFAULT_RULES):
+        bb = cls(rules)
+        bb.masks = list(position)
+        occupied = position[0] | position[1]
+        bb.heights = [((occupied >> (col * rules.stride)) & rules.column_mask).bit_length()
+                      for col in range(rules.columns)]
+        bb.ply = sum(bb.heights)
+        return bb
+
+    def can_play(self, col):
+        return self.heights[col] < self.rules.rows
+
+    def play(self, col, player):
+        row = self.heights[col]
+        self.masks[player] |= 1 << (col * self.rules.stride + row)
+        self.heights[col] = row + 1
+        self.moves.append((col, player))
+        self.ply += 1
+        return row
+
+    def undo(self):
+        col, player = self.moves.pop()
+        row = self.heights[col] - 1
+        self.masks[player] ^= 1 << (col * self.rules.stride + row)
+        self.heights[col] = row
+        self.ply -= 1
+        return col
+
+    def has_won(self, player):
+        # Whether the player has `connect` in a row anywhere on the board
+        m = self.masks[player]
+        for steps in self.rules.run_shifts:
+            run = m
+            for step in steps:
+                run &= run >> step
+            if run:
+                return True
+        return False
+
+    def last_move_won(self):
+        # Whether the last piece played completed a line. Only lines through
+        # that piece can have changed, so each direction is walked outwards
+        # from it instead of testing every cell of the board.
+        col, player = self.moves[-1]
+        rules = self.rules
+        connect = rules.connect
+        m = self.masks[player]
+        bit = 1 << (col * rules.stride + self.heights[col] - 1)
+        for shift in rules.win_shifts:
+            count = 1
+            b = bit >> shift
+            while m & b:
+                count += 1
+                b >>= shift
+            if shift > 1:  # nothing lies above the piece just played
+                b = bit << shift
+                while m & b:
+                    count += 1
+                    b <<= shift
+            if count >= connect:
+                return True
+        return False
+
+    def is_full(self):
+        return self.ply == self.rules.cells
+
+    def open_windows(self, player):
+        # Counts the windows of `connect` cells holding no opponent piece and
+        # exactly connect-2 / connect-1 of the player's (two / three for
+        # connect four). All windows of one direction are scored at once:
+        # the cells of every window are added bitwise, each bit position
+        # holding the sum for the window that starts there. Off-board and
+        # guard bits are zero in `free`, so only real windows survive.
+        rules = self.rules
+        if rules.connect != 4:
+            return self._open_windows_any(player)
+        mine = self.masks[player]
+        free = rules.board_mask & ~self.masks[1 - player]
+        twos = threes = 0
+        for shift in rules.win_shifts:
+            windows = free & (free >> shift) & (free >> (2 * shift)) & (free >> (3 * shift))
+            x1 = mine >> shift
+            x2 = mine >> (2 * shift)
+            x3 = mine >> (3 * shift)
+            a = mine ^ x1
+            b = x2 ^ x3
+            ones = a ^ b
+            twos_bit = (mine & x1) ^ (x2 & x3) ^ (a & b)  # 0 for a full window
+            twos += (windows & twos_bit & ~ones).bit_count()
+            threes += (windows & twos_bit & ones).bit_count()
+        return twos, threes
+
+    def _open_windows_any(self, player):
+        # open_windows() for any window length: the window sums are kept as
+        # binary digits, one mask per digit, and a shifted copy of `mine` is
+        # added per cell with a ripple carry
+        rules = self.rules
+        mine = self.masks[player]
+        free = rules.board_mask & ~self.masks[1 - player]
+        connect = rules.connect
+        twos = threes = 0
+        for shift in rules.win_shifts:
+            windows = free
+            digits = []
+            for i in range(connect):
+                windows &= free >> (i * shift)
+                carry = mine >> (i * shift)
+                for j, digit in enumerate(digits):
+                    digits[j] = digit ^ carry
+                    carry &= digit
+                if carry:
+                    digits.append(carry)
+            for target in (connect - 2, connect - 1):
+                match = windows
+                for j, digit in enumerate(digits):
+                    match &= digit if target >> j & 1 else ~digit
+                if target >> len(digits):
+                    match = 0
+                if target == connect - 1:
+                    threes += match.bit_count()
+                else:
+                    twos += match.bit_count()
+        return twos, threes
+
+    def key(self, player=0):
+        # The player's stones plus one marker bit above each column's stack;
+        # unique per position and fits in rows+1 bits per column.
+        m0, m1 = self.masks
+        return self.masks[player] + (m0 | m1) + self.rules.bottom_mask
+
+    def canonical_key(self, player=0):
+        # Returns (key, mirrored): the smaller of the key and its left-right
+        # mirror, so symmetric positions share one table entry.
+        key = self.key(player)
+        rules = self.rules
+        stride, column_mask, last = rules.stride, rules.column_mask, rules.columns - 1
+        mirror = 0
+        for col in range(rules.columns):
+            mirror |= ((key >> (col * stride)) & column_mask) << ((last - col) * stride)
+        if mirror < key:
+            return mirror, True
+        return key, False
+
+    def cell(self, row, col):
+        bit = 1 << (col * self.rules.stride + row)
+        if self.masks[0] & bit:
+            return 1
+        if self.masks[1] & bit:
+            return 2
+        return 0
+
+    def to_array(self):
+        import numpy as np  # only array users pay for importing NumPy
+        board = np.zeros((self.rules.rows, self.rules.columns), dtype=np.int8)
+        for col in range(self.rules.columns):
+            for row in range(self.heights[col]):
+                board[row][col] = self.cell(row, col)
+        return board
+
+    @classmethod
+    def from_array(cls, board, rules=DEFAULT_RULES):
+        # Inverse of to_array(); pieces must rest on the bottom or on each other
+        masks = [0, 0]
+        for col in range(rules.columns):
+            for row in range(rules.rows):
+                piece = board[row][col]
+                if piece:
+                    masks[int(piece) - 1] |= 1 << (col * rules.stride + row)
+        return cls.from_position(masks, rules)
@@ -0,0 +1,618 @@
+"""Game state and the AI levels: minimax search and its parallel root."""
+import logging
+import random
+import time
+
+from .board import DEFAULT_RULES, Bitboard
+from .stats import SearchStats, SearchTimeout
+from .tables import (BOOK_WIN, EXACT, LOWER_BOUND, TB_DRAW, TB_LOSS, TB_WIN, TT_SIZE, UPPER_BOUND,
+                     TranspositionTable, default_opening_book, default_tablebase)
+
+
+log = logging.getLogger("connect4")
+
+# AI difficulty -> Connect4Game method that picks and plays a move for piece 2
+AI_LEVELS = {"easy": "random_ai", "medium": "medium_ai", "hard": "hard_ai", "mcts": "mcts_ai"}
+
+# Search
+WIN_SCORE = 100000
+AI_TIME_BUDGETS = (250, 500, 1000, 2000)  # ms per move for hard_ai and mcts_ai, cycled in the menu
+AI_TIME_BUDGET_MS = 500
+DEADLINE_CHECK_NODES = 64  # how often minimax looks at the clock, ~1 ms of search
+DEADLINE_MARGIN_MS = 2  # budget kept back for unwinding the search and building its stats
+KILLERS_PER_PLY = 2
+AI_WORKERS = 1  # processes for hard_ai; more than 1 searches root moves in parallel
+POOL_POLL_SECONDS = 0.01  # how often the parallel root checks the clock
+
+# Monte Carlo tree search, the "mcts" level
+MCTS_EXPLORATION = 1.0  # UCT exploration constant
+MCTS_RAVE = True  # blend all-moves-as-first (AMAF) statistics into UCT
+MCTS_RAVE_EQUIVALENCE = 500  # visits at which a move's own and AMAF values weigh the same
+MCTS_LEAVES_PER_BATCH = 32  # leaves selected, with a virtual loss, per batch of playouts
+MCTS_PLAYOUTS_PER_LEAF = 8
+MCTS_PLAYOUTS = None  # playout budget per move; None plays until the time budget runs out
+# (a leaf where the game is over counts as MCTS_PLAYOUTS_PER_LEAF playouts)
+
+# Heuristic evaluation weights
+THREE_WEIGHT = 5  # three pieces and an empty cell in a window of four
+TWO_WEIGHT = 2  # two pieces and two empty cells
+CENTER_WEIGHT = 3  # per piece in the center column
+
+
+class Connect4Game:
+    def __init__(self, tt_size=TT_SIZE, rules=DEFAULT_RULES):
+        self.rules = rules  # board size and win length, see Rules
+        self.bitboard = Bitboard(rules)
+        self.tt = TranspositionTable(tt_size)  # kept across moves, cleared by reset()
+        self.game_over = False
+        self.turn = 0  # 0 for player 1, 1 for player 2
+        self.winner = None
+        self.start_clock()
+        self.mode = None  # Will be set to "1v1", "1vAI", "online" or "spectate"
+        self.ai_difficulty = "medium"  # easy, medium, hard
+        self.ai_time_budget_ms = AI_TIME_BUDGET_MS  # per move, used by hard_ai and mcts_ai
+        self.ai_workers = AI_WORKERS
+        self.mcts_playouts = MCTS_PLAYOUTS  # per move, used by mcts_ai with the time budget
+        self.mcts_rave = MCTS_RAVE
+        self._mcts = None  # MonteCarloSearch, its tree kept across moves
+        self.opening_book = default_opening_book() if rules == DEFAULT_RULES else None
+        self.tablebase = default_tablebase() if rules == DEFAULT_RULES else None
+        self._pool = None
+        self._pool_workers = 0
+        self._pool_stop = None  # multiprocessing.Event shared with pool workers
+        self._pool_rules = None
+        self.nodes = 0
+        self.cutoffs = 0
+        self.last_search = SearchStats()
+        self._remote_tt = [0, 0]  # probes, hits made by pool workers this search
+        self.search_depth = 0  # deepest completed iteration of the last search
+        self.search_score = 0  # and the best move's score at that depth
+        self._deadline = None
+        self._stop = None  # threading.Event that aborts the running search
+        self.killers = [[] for _ in range(rules.cells + 1)]  # by ply
+        self.history = [[0] * rules.columns for _ in range(2)]  # by player, column
+
+    @property
+    def board(self):
+        # Read-only (rows, columns) array, row 0 at the bottom
+        board = self.bitboard.to_array()
+        board.flags.writeable = False
+        return board
+
+    def reset(self):
+        self.bitboard = Bitboard(self.rules)
+        self.tt.clear()
+        if self._mcts is not None:
+            self._mcts.clear()
+        self.killers = [[] for _ in range(self.rules.cells + 1)]
+        self.history = [[0] * self.rules.columns for _ in range(2)]
+        self.game_over = False
+        self.turn = 0
+        self.winner = None
+        self.start_clock()
+
+    def start_clock(self):
+        # Think time is counted from here for the first move, then from the
+        # previous move
+        self.started = time.time()
+        self.think_time = [0.0, 0.0]  # seconds, per player
+        self._turn_started = time.perf_counter()
+
+    def drop_piece(self, row, col, piece):
+        # The row is implied by the column height on a bitboard
+        self.bitboard.play(col, piece - 1)
+
+    def is_valid_location(self, col):
+        # Columns from the network or a click may be out of range; the search
+        # only asks about real ones and calls Bitboard.can_play directly
+        return 0 <= col < self.rules.columns and self.bitboard.can_play(col)
+
+    def get_next_open_row(self, col):
+        if self.is_valid_location(col):
+            return self.bitboard.heights[col]
+
+    def winning_move(self, piece):
+        return self.bitboard.has_won(piece - 1)
+
+    def is_board_full(self):
+        return self.bitboard.is_full()
+
+    def make_move(self, col):
+        if self.game_over or not self.is_valid_location(col):
+            return False
+
+        piece = self.turn + 1
+        self.bitboard.play(col, self.turn)
+        now = time.perf_counter()
+        self.think_time[self.turn] += now - self._turn_started
+        self._turn_started = now
+
+        if self.bitboard.last_move_won():
+            self.game_over = True
+            self.winner = piece
+        elif self.is_board_full():
+            self.game_over = True
+            self.winner = 0  # Draw
+
+        self.turn = (self.turn + 1) % 2
+        return True
+
+    def ai_move(self):
+        if self.game_over:
+            return
+
+        return getattr(self, AI_LEVELS.get(self.ai_difficulty, "hard_ai"))()
+
+    def random_ai(self):
+        valid_locations = [col for col in range(self.rules.columns) if self.is_valid_location(col)]
+        if valid_locations:
+            col = random.choice(valid_locations)
+            self.make_move(col)
+            return col
+        return None
+
+    def medium_ai(self):
+        bb = self.bitboard
+        # Win if possible (piece 2), otherwise block the opponent (piece 1)
+        for player in (1, 0):
+            for col in range(self.rules.columns):
+                if bb.can_play(col):
+                    bb.play(col, player)
+                    won = bb.last_move_won()
+                    bb.undo()
+                    if won:
+                        self.make_move(col)
+                        return col
+
+        return self.random_ai()
+
+    def hard_ai(self):
+        best_col = self.lookup_move()
+        if best_col is None:
+            best_col = self.iterative_deepening(self.ai_time_budget_ms)
+        if best_col is None:
+            return None
+        self.make_move(best_col)
+        return best_col
+
+    def mcts_ai(self):
+        col = self.mcts_move(self.ai_time_budget_ms)
+        if col is None:
+            return None
+        self.make_move(col)
+        return col
+
+    def mcts_move(self, budget_ms, stop=None):
+        # The AI's (piece 2) move by Monte Carlo tree search within the time
+        # budget and mcts_playouts, whichever runs out first
+        if self._mcts is None:
+            from .mcts import MonteCarloSearch  # NumPy is only imported once MCTS is played
+            self._mcts = MonteCarloSearch(self.rules)
+        self._mcts.rave = self.mcts_rave
+        stats = self._mcts.search(self.bitboard, budget_ms, self.mcts_playouts, stop)
+        if stats is None:
+            return None
+        self._finish_search(stats)
+        return stats.move
+
+    def lookup_move(self):
+        # The AI's (piece 2) move from the opening book or the endgame
+        # tablebase, or None to search
+        col = self.book_move()
+        if col is None:
+            col = self.tablebase_move()
+        return col
+
+    def tablebase_move(self):
+        # The AI's (piece 2) best move by the tablebase: the fastest win,
+        # else a draw, else the slowest loss. None unless every move's
+        # result is known.
+        bb = self.bitboard
+        if self.tablebase is None or self.rules.cells - bb.ply > self.tablebase.empty:
+            return None
+        results = {}
+        for col in self.rules.center_order:
+            if not bb.can_play(col):
+                continue
+            bb.play(col, 1)
+            if bb.last_move_won():
+                entry = (TB_WIN, 1)
+            elif bb.is_full():
+                entry = (TB_DRAW, 1)
+            else:
+                entry = self.tablebase.probe(bb, 0)
+                if entry is not None:
+                    entry = (TB_WIN - entry[0], entry[1] + 1)
+            bb.undo()
+            if entry is None:
+                return None
+            results[col] = entry
+        if not results:
+            return None
+        move = max(results, key=lambda col: (results[col][0], -results[col][1] if results[col][0] == TB_WIN
+                                             else results[col][1]))
+        scores = {TB_WIN: WIN_SCORE, TB_DRAW: 0, TB_LOSS: -WIN_SCORE}
+        stats = SearchStats()
+        stats.source = "tablebase"
+        stats.move = move
+        stats.score = scores[results[move][0]]
+        stats.depth = results[move][1]
+        stats.pv = [move]
+        stats.column_scores = {col: scores[results[col][0]] for col in sorted(results)}
+        self._finish_search(stats)
+        return move
+
+    def book_move(self):
+        # The AI's (piece 2) move from the opening book, or None
+        if self.opening_book is None or self.bitboard.ply > self.opening_book.plies:
+            return None
+        key, mirrored = self.bitboard.canonical_key()
+        entry = self.opening_book.lookup(key)
+        if entry is None:
+            return None
+        move, depth, score = entry
+        if mirrored:
+            move = self.rules.columns - 1 - move
+        if abs(score) >= BOOK_WIN:  # a proven result
+            score = WIN_SCORE if score > 0 else -WIN_SCORE
+        stats = SearchStats()
+        stats.source = "book"
+        stats.move = move
+        stats.score = score
+        stats.depth = depth
+        stats.pv = [move]
+        stats.column_scores = {move: score}
+        self._finish_search(stats)
+        return move
+
+    def iterative_deepening(self, budget_ms, stop=None, max_depth=None):
+        # Search depth 1, 2, 3... for the AI (piece 2) until the budget runs
+        # out and return the best column of the deepest completed iteration.
+        # budget_ms=None searches until `stop` is set, max_depth is reached
+        # or the result is known.
+        bb = self.bitboard
+        moves = [col for col in self.rules.center_order if bb.can_play(col)]
+        if not moves:
+            return None
+
+        self._new_search()
+        self._remote_tt = [0, 0]
+        tt_probes, tt_hits = self.tt.probes, self.tt.hits
+        scores = {}
+        bounds = set()
+        start = time.perf_counter()
+        deadline = start + max(budget_ms - DEADLINE_MARGIN_MS, 0) / 1000 if budget_ms is not None else None
+        ply = bb.ply
+        best_col = moves[0]
+        self.search_depth = 0
+        self.search_score = 0
+        self._stop = stop
+        last_depth = self.rules.cells - ply
+        if max_depth is not None:
+            last_depth = min(last_depth, max_depth)
+
+        for depth in range(1, last_depth + 1):
+            # The first iteration always completes so there is a move to return
+            self._deadline = deadline if depth > 1 else None
+            iteration_bounds = set()
+            try:
+                iteration_scores = self._search_root(moves, depth, iteration_bounds)
+            except SearchTimeout:
+                while bb.ply > ply:
+                    bb.undo()
+                break
+            scores = iteration_scores
+            bounds = iteration_bounds
+
+            # Next iteration tries the best moves first; the sort is stable
+            # so ties keep the previous iteration's order
+            moves.sort(key=lambda col: scores[col], reverse=True)
+            best_col = moves[0]
+            self.search_depth = depth
+            self.search_score = scores[best_col]
+            if abs(scores[best_col]) >= WIN_SCORE:
+                break  # forced result, deeper search cannot change it
+            # The next iteration costs several times this one; don't start
+            # it if it cannot finish
+            if deadline is not None and time.perf_counter() - start > (deadline - start) / 2:
+                break
+
+        self._deadline = None
+        self._stop = None
+
+        stats = SearchStats()
+        stats.source = "search"
+        stats.move = best_col
+        stats.score = self.search_score
+        stats.depth = self.search_depth
+        stats.nodes = self.nodes
+        stats.cutoffs = self.cutoffs
+        stats.tt_probes = self.tt.probes - tt_probes + self._remote_tt[0]
+        stats.tt_hits = self.tt.hits - tt_hits + self._remote_tt[1]
+        stats.elapsed = time.perf_counter() - start
+        stats.column_scores = {col: scores[col] for col in sorted(scores)}
+        stats.bounds = bounds
+        stats.pv = self.principal_variation(best_col, self.search_depth)
+        self._finish_search(stats)
+        return best_col
+
+    def _new_search(self):
+        self.tt.new_search()
+        self.killers = [[] for _ in range(self.rules.cells + 1)]
+        self.history = [[h // 2 for h in row] for row in self.history]
+        self.nodes = 0
+        self.cutoffs = 0
+
+    def score_columns(self, depth):
+        # Score of every legal column for the side to move, from its side.
+        # Unlike _search_root each move gets a full window, so the scores
+        # are exact rather than bounds.
+        bb = self.bitboard
+        player = bb.ply % 2
+        scores = {}
+        for col in self.rules.center_order:
+            if bb.can_play(col):
+                bb.play(col, player)
+                score = self.minimax(depth-1, -float('inf'), float('inf'), player == 0)
+                bb.undo()
+                scores[col] = score if player == 1 else -score
+        return scores
+
+    def _finish_search(self, stats):
+        self.last_search = stats
+        if log.isEnabledFor(logging.INFO):
+            import json
+            log.info("search %s", json.dumps(stats.as_dict()))
+
+    def principal_variation(self, first, length):
+        # The AI's move followed by the best replies remembered in the table
+        bb = self.bitboard
+        pv = []
+        col, player = first, 1
+        while col is not None and len(pv) < length and bb.can_play(col):
+            bb.play(col, player)
+            pv.append(col)
+            if bb.last_move_won() or bb.is_full():
+                break
+            player = 1 - player
+            col = self.table_move()
+        for _ in pv:
+            bb.undo()
+        return pv
+
+    def _search_root(self, moves, depth, bounds=None):
+        # Each move is searched against the best score so far, so a move
+        # that cannot beat it fails low: its score is only an upper bound.
+        # Those columns are added to `bounds` when it is given.
+        if self.ai_workers > 1:
+            return self._search_root_parallel(moves, depth, bounds)
+        bb = self.bitboard
+        scores = {}
+        best_score = -float('inf')
+        for col in moves:
+            bb.play(col, 1)
+            score = self.minimax(depth-1, best_score, float('inf'), False)
+            bb.undo()
+            scores[col] = score
+            if score <= best_score and bounds is not None:
+                bounds.add(col)
+            best_score = max(best_score, score)
+        return scores
+
+    def _search_root_parallel(self, moves, depth, bounds=None):
+        # Root moves are searched in pool processes, which get only the
+        # compact position. The first (best ordered) move is searched alone
+        # and its score is the lower bound the remaining moves are searched
+        # against in parallel, so they can still cut off.
+        pool = self._get_pool()
+        position = self.bitboard.position()
+        scores = self._collect(pool, position, moves[:1], depth, -float('inf'))
+        if len(moves) > 1:
+            alpha = scores[moves[0]]
+            scores.update(self._collect(pool, position, moves[1:], depth, alpha))
+            if bounds is not None:
+                bounds.update(col for col in moves[1:] if scores[col] <= alpha)
+        return scores
+
+    def _collect(self, pool, position, moves, depth, alpha):
+        from concurrent.futures import wait
+        futures = [pool.submit(_search_root_move, position, col, depth, alpha) for col in moves]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=POOL_POLL_SECONDS)
+            if pending and self._out_of_time():
+                self._pool_stop.set()
+        self._pool_stop.clear()
+
+        scores = {}
+        timed_out = False
+        for col, future in zip(moves, futures):
+            score, nodes, cutoffs, tt_probes, tt_hits = future.result()
+            self.nodes += nodes
+            self.cutoffs += cutoffs
+            self._remote_tt[0] += tt_probes
+            self._remote_tt[1] += tt_hits
+            if score is None:
+                timed_out = True
+            scores[col] = score
+        if timed_out:
+            raise SearchTimeout()
+        return scores
+
+    def _get_pool(self):
+        if self._pool is None or self._pool_workers != self.ai_workers or self._pool_rules != self.rules:
+            self.shutdown_pool()
+            # Imported here, not with the module, so that only parallel
+            # searches pay for loading multiprocessing
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn, not fork: the GUI process runs threads. Each worker
+            # re-imports the launching script as __mp_main__, so scripts
+            # that search in parallel keep their startup under
+            # `if __name__ == "__main__"`
+            context = multiprocessing.get_context("spawn")
+            self._pool_stop = context.Event()
+            self._pool = ProcessPoolExecutor(self.ai_workers, mp_context=context, initializer=_init_search_worker,
+                                             initargs=(self._pool_stop, self.rules))
+            self._pool_workers = self.ai_workers
+            self._pool_rules = self.rules
+        return self._pool
+
+    def shutdown_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _out_of_time(self):
+        if self._stop is not None and self._stop.is_set():
+            return True
+        return self._deadline is not None and time.perf_counter() > self._deadline
+
+    def table_move(self):
+        # Best move remembered for the current position, or None
+        key, mirrored = self.bitboard.canonical_key()
+        entry = self.tt.probe(key)
+        if entry is None:
+            return None
+        move = entry[3]
+        return self.rules.columns - 1 - move if mirrored else move
+
+    def evaluate(self):
+        # Heuristic score of a quiet position from the AI's (piece 2) side
+        bb = self.bitboard
+        score = 0
+        for player, sign in ((1, 1), (0, -1)):
+            twos, threes = bb.open_windows(player)
+            center = (bb.masks[player] & self.rules.center_mask).bit_count()
+            score += sign * (THREE_WEIGHT * threes + TWO_WEIGHT * twos + CENTER_WEIGHT * center)
+        return score
+
+    def order_moves(self, moves, ply, player, tt_move):
+        # Sorts in place: table move, killers, then history score. `moves`
+        # arrives center-out and the sort is stable, so that breaks ties.
+        history = self.history[player]
+        moves.sort(key=history.__getitem__, reverse=True)
+        for col in reversed(self.killers[ply]):
+            if col in moves:
+                moves.remove(col)
+                moves.insert(0, col)
+        if tt_move is not None:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+    def record_cutoff(self, ply, player, col, depth):
+        killers = self.killers[ply]
+        if col not in killers:
+            killers.insert(0, col)
+            del killers[KILLERS_PER_PLY:]
+        self.history[player][col] += depth * depth
+        self.cutoffs += 1
+
+    def minimax(self, depth, alpha, beta, maximizing_player):
+        bb = self.bitboard
+        self.nodes += 1
+        if self.nodes % DEADLINE_CHECK_NODES == 0 and self._out_of_time():
+            raise SearchTimeout()
+
+        # Only the piece just played can have completed a line
+        if bb.last_move_won():
+            return -WIN_SCORE if maximizing_player else WIN_SCORE
+
+        valid_locations = [col for col in self.rules.center_order if bb.can_play(col)]
+        if not valid_locations:
+            return 0
+        tablebase = self.tablebase
+        if tablebase is not None and self.rules.cells - bb.ply <= tablebase.empty:
+            entry = tablebase.probe(bb, 1 if maximizing_player else 0)
+            if entry is not None:
+                result = entry[0] - TB_DRAW  # -1, 0 or 1 for the side to move
+                return result * WIN_SCORE if maximizing_player else -result * WIN_SCORE
+        if depth == 0:
+            return self.evaluate()
+
+        key, mirrored = bb.canonical_key()
+        entry = self.tt.probe(key)
+        alpha_orig, beta_orig = alpha, beta
+        tt_move = None
+        if entry is not None:
+            entry_depth, flag, entry_value, tt_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return entry_value
+                if flag == LOWER_BOUND:
+                    alpha = max(alpha, entry_value)
+                else:
+                    beta = min(beta, entry_value)
+                if alpha >= beta:
+                    return entry_value
+            if mirrored:
+                tt_move = self.rules.columns - 1 - tt_move
+
+        ply = bb.ply
+        player = 1 if maximizing_player else 0
+        self.order_moves(valid_locations, ply, player, tt_move)
+
+        best_move = valid_locations[0]
+        if maximizing_player:
+            value = -float('inf')
+            for col in valid_locations:
+                bb.play(col, 1)
+                new_score = self.minimax(depth-1, alpha, beta, False)
+                bb.undo()
+                if new_score > value:
+                    value = new_score
+                    best_move = col
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    self.record_cutoff(ply, player, col, depth)
+                    break
+        else:
+            value = float('inf')
+            for col in valid_locations:
+                bb.play(col, 0)
+                new_score = self.minimax(depth-1, alpha, beta, True)
+                bb.undo()
+                if new_score < value:
+                    value = new_score
+                    best_move = col
+                beta = min(beta, value)
+                if alpha >= beta:
+                    self.record_cutoff(ply, player, col, depth)
+                    break
+
+        if value <= alpha_orig:
+            flag = UPPER_BOUND
+        elif value >= beta_orig:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        if mirrored:
+            best_move = self.rules.columns - 1 - best_move
+        self.tt.store(key, depth, flag, value, best_move)
+        return value
+
+
+# Parallel root search, run inside pool processes
+_worker_engine = None
+
+
+def _init_search_worker(stop, rules):
+    global _worker_engine
+    _worker_engine = Connect4Game(rules=rules)  # its table lives as long as the process
+    _worker_engine._stop = stop
+
+
+def _search_root_move(position, col, depth, alpha):
+    # Returns (score, nodes, cutoffs, table probes, table hits); score is
+    # None when the search was stopped
+    engine = _worker_engine
+    engine.bitboard = Bitboard.from_position(position, engine.rules)
+    engine.bitboard.play(col, 1)
+    engine.nodes = 0
+    engine.cutoffs = 0
+    tt_probes, tt_hits = engine.tt.probes, engine.tt.hits
+    try:
+        score = engine.minimax(depth-1, alpha, float('inf'), False)
+    except SearchTimeout:
+        score = None
+    return score, engine.nodes, engine.cutoffs, engine.tt.probes - tt_probes, engine.tt.hits - tt_hits
@@ -0,0 +1,169 @@
+"""Compact, memory-mapped log of finished games."""
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from .board import COLUMN_COUNT, CONNECT, DEFAULT_RULES, ROW_COUNT
+from .game import AI_LEVELS
+from .tables import DATA_DIR
+
+
+# Game log: header, then one fixed-size record per game, appended as games end
+GAME_LOG_PATH = os.path.join(DATA_DIR, "games.c4g")
+GAME_LOG_MAGIC = b"C4GL"
+GAME_LOG_VERSION = 1
+GAME_LOG_HEADER = struct.Struct("<4sBBBx")  # magic, version, rows, columns
+MOVE_BITS = 3  # per move, enough for 8 columns
+MOVE_BYTES = 16  # ROW_COUNT * COLUMN_COUNT moves, packed
+# mode, player 1, player 2, result, plies, start (unix s), duration ms, think ms per player, moves
+GAME_RECORD = struct.Struct(f"<BBBBB3xIIII{MOVE_BYTES}s")
+GAME_RECORD_DTYPE = np.dtype([
+    ("mode", "u1"), ("player1", "u1"), ("player2", "u1"), ("result", "u1"), ("plies", "u1"), ("pad", "u1", (3,)),
+    ("started", "<u4"), ("duration_ms", "<u4"), ("think_ms", "<u4", (2,)), ("moves", "u1", (MOVE_BYTES,)),
+])
+GAME_MODES = ("1v1", "1vAI", "online", "spectate", "selfplay")
+RESULT_UNFINISHED = 3  # results 0-2 are Connect4Game.winner
+PLAYER_KINDS = ("human", "remote") + tuple(AI_LEVELS)  # who played a side, in game records
+
+
+class GameRecord:
+    # One game as stored in the game log
+    def __init__(self, mode, players, result, moves, started=0, think_ms=(0, 0)):
+        self.mode = mode  # one of GAME_MODES
+        self.players = tuple(players)  # PLAYER_KINDS of piece 1 and piece 2
+        self.result = result  # 0 draw, 1 or 2 the winning piece, RESULT_UNFINISHED
+        self.moves = list(moves)  # columns in play order
+        self.started = int(started)  # unix time
+        self.think_ms = tuple(int(ms) for ms in think_ms)  # total per player
+
+    @property
+    def duration_ms(self):
+        return sum(self.think_ms)
+
+    @classmethod
+    def from_game(cls, game):
+        if game.rules != DEFAULT_RULES:
+            raise ValueError(f"the game log only stores {ROW_COUNT}x{COLUMN_COUNT} connect {CONNECT} games")
+        if game.mode == "1vAI":
+            players = ("human", game.ai_difficulty)
+        elif game.mode == "online":
+            players = ("human", "remote") if game.is_host else ("remote", "human")
+        elif game.mode == "spectate":
+            players = ("remote", "remote")
+        else:
+            players = ("human", "human")
+        result = game.winner if game.game_over else RESULT_UNFINISHED
+        return cls(game.mode, players, result, [col for col, _ in game.bitboard.moves],
+                   game.started, [t * 1000 for t in game.think_time])
+
+    def pack(self):
+        packed = 0
+        for i, col in enumerate(self.moves):
+            packed |= col << (MOVE_BITS * i)
+        return GAME_RECORD.pack(GAME_MODES.index(self.mode), PLAYER_KINDS.index(self.players[0]),
+                                PLAYER_KINDS.index(self.players[1]), self.result, len(self.moves), self.started,
+                                self.duration_ms, *self.think_ms, packed.to_bytes(MOVE_BYTES, "little"))
+
+    @classmethod
+    def unpack_from(cls, buffer, offset=0):
+        mode, player1, player2, result, plies, started, _, think1, think2, packed = GAME_RECORD.unpack_from(buffer, offset)
+        packed = int.from_bytes(packed, "little")
+        moves = [(packed >> (MOVE_BITS * i)) & ((1 << MOVE_BITS) - 1) for i in range(plies)]
+        return cls(GAME_MODES[mode], (PLAYER_KINDS[player1], PLAYER_KINDS[player2]), result, moves, started,
+                   (think1, think2))
+
+    def replay(self, game):
+        # Plays the moves on a freshly reset game with make_move
+        for col in self.moves:
+            if not game.make_move(col):
+                raise ValueError(f"illegal move {col} at ply {game.bitboard.ply}")
+        return game
+
+
+def pack_moves(moves):
+    # (n, plies) columns, -1 past the end of a game -> (n, MOVE_BYTES) uint8
+    moves = np.asarray(moves, dtype=np.int8)
+    n, plies = moves.shape
+    bits = (np.maximum(moves, 0)[:, :, None] >> np.arange(MOVE_BITS, dtype=np.int8)) & 1
+    out = np.zeros((n, MOVE_BYTES * 8), dtype=np.uint8)
+    out[:, :plies * MOVE_BITS] = bits.reshape(n, -1)
+    return np.packbits(out, axis=1, bitorder="little")
+
+
+def unpack_moves(records):
+    # Structured GAME_RECORD_DTYPE array -> (n, ROW_COUNT * COLUMN_COUNT) int8
+    # columns, -1 past the end of each game
+    plies = ROW_COUNT * COLUMN_COUNT
+    bits = np.unpackbits(records["moves"], axis=1, bitorder="little")[:, :plies * MOVE_BITS]
+    bits = bits.reshape(len(records), plies, MOVE_BITS).astype(np.int8)
+    moves = (bits << np.arange(MOVE_BITS, dtype=np.int8)).sum(axis=2, dtype=np.int8)
+    moves[np.arange(plies) >= records["plies"][:, None]] = -1
+    return moves
+
+
+class GameLogWriter:
+    # Appends records to a game log, creating it if needed. Every record is
+    # flushed as it is written, so readers see finished games right away and
+    # a crash loses at most the record being written.
+    def __init__(self, path=GAME_LOG_PATH):
+        self.file = open(path, "ab+")
+        self.file.seek(0)
+        header = self.file.read(GAME_LOG_HEADER.size)
+        if not header:
+            self.file.write(GAME_LOG_HEADER.pack(GAME_LOG_MAGIC, GAME_LOG_VERSION, ROW_COUNT, COLUMN_COUNT))
+        elif header != GAME_LOG_HEADER.pack(GAME_LOG_MAGIC, GAME_LOG_VERSION, ROW_COUNT, COLUMN_COUNT):
+            self.file.close()
+            raise ValueError(f"{path}: not a game log for this board")
+        else:
+            # Drop a record left half-written by a crash
+            size = self.file.seek(0, os.SEEK_END)
+            self.file.truncate(size - (size - GAME_LOG_HEADER.size) % GAME_RECORD.size)
+        self.file.flush()
+
+    def append(self, record):
+        self.file.write(record.pack())
+        self.file.flush()
+
+    def append_array(self, records):
+        # Bulk import of a GAME_RECORD_DTYPE array
+        self.file.write(np.ascontiguousarray(records, dtype=GAME_RECORD_DTYPE).tobytes())
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class GameLog:
+    # Read-only, memory-mapped view of a game log; game i is found by offset
+    def __init__(self, path=GAME_LOG_PATH):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < GAME_LOG_HEADER.size:
+                raise ValueError(f"{path}: not a game log")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, columns = GAME_LOG_HEADER.unpack_from(self.map)
+        if magic != GAME_LOG_MAGIC or version != GAME_LOG_VERSION:
+            raise ValueError(f"{path}: not a game log")
+        if (rows, columns) != (ROW_COUNT, COLUMN_COUNT):
+            raise ValueError(f"{path}: log is for a {rows}x{columns} board")
+        self.count = (size - GAME_LOG_HEADER.size) // GAME_RECORD.size  # a torn last record is ignored
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return GameRecord.unpack_from(self.map, GAME_LOG_HEADER.size + index * GAME_RECORD.size)
+
+    def to_numpy(self):
+        # Every record as a GAME_RECORD_DTYPE array over the mapping, without
+        # copying; copy() it to keep it past close()
+        return np.frombuffer(self.map, dtype=GAME_RECORD_DTYPE, count=self.count, offset=GAME_LOG_HEADER.size)
+
+    def close(self):
+        self.map.close()
@@ -0,0 +1,309 @@
+"""Monte Carlo tree search with batched NumPy playouts."""
+import logging
+import math
+import time
+
+import numpy as np
+
+from .board import DEFAULT_RULES
+from .game import MCTS_EXPLORATION, MCTS_LEAVES_PER_BATCH, MCTS_PLAYOUTS_PER_LEAF, MCTS_RAVE, MCTS_RAVE_EQUIVALENCE
+from .stats import SearchStats
+
+
+log = logging.getLogger("connect4")
+
+
+# Monte Carlo tree search: random playouts of many boards at once. Boards
+# whose bitboard fits in 64 bits are played as uint64 masks; larger ones as
+# (n, rows, columns) 0/1/2 grids padded by connect-1 empty cells on every
+# side, so the lines through a piece can be read without bounds checks.
+def random_playouts(bitboards, to_move, repeat, rng):
+    # Plays each bitboard `repeat` times to the end with uniformly random
+    # legal moves, player to_move[i] (0/1) moving first on bitboards[i]; all
+    # bitboards share one Rules. Returns (winner, played)
+    # for the len(bitboards) * repeat games, grouped by bitboard: winner
+    # (n,) int8 as Connect4Game.winner, 0 for a draw; played (n, 2,
+    # columns) bool, the columns each player dropped a piece into during
+    # the playout (for RAVE).
+    rules = bitboards[0].rules
+    heights = np.repeat(np.array([bb.heights for bb in bitboards], dtype=np.int64), repeat, axis=0)
+    player = np.repeat(np.array(to_move, dtype=np.int8), repeat)
+    if rules.stride * rules.columns <= 64:
+        masks = np.repeat(np.array([bb.masks for bb in bitboards], dtype=np.uint64), repeat, axis=0)
+        return _playouts_bitboard(rules, masks, heights, player, rng)
+    boards = np.repeat(np.array([bb.to_array() for bb in bitboards]), repeat, axis=0)
+    return _playouts_grid(rules, boards, heights, player, rng)
+
+
+def _random_columns(rules, heights, rng):
+    # A random legal column per board: the largest random key among open columns
+    keys = rng.random(heights.shape)
+    keys[heights >= rules.rows] = -1.0
+    return keys.argmax(axis=1)
+
+
+def _playouts_bitboard(rules, masks, heights, player, rng):
+    n = len(masks)
+    plies = heights.sum(axis=1)
+    winner = np.zeros(n, dtype=np.int8)
+    played = np.zeros((n, 2, rules.columns), dtype=bool)
+    run_shifts = [[np.uint64(step) for step in steps] for steps in rules.run_shifts]
+    one = np.uint64(1)
+    active = np.flatnonzero(plies < rules.cells)
+    while len(active):
+        col = _random_columns(rules, heights[active], rng)
+        row = heights[active, col]
+        mover = player[active]
+        m = masks[active, mover] | (one << (col * rules.stride + row).astype(np.uint64))
+        masks[active, mover] = m
+        heights[active, col] += 1
+        played[active, mover, col] = True
+        plies[active] += 1
+
+        won = np.zeros(len(active), dtype=bool)
+        for steps in run_shifts:
+            run = m
+            for step in steps:
+                run = run & (run >> step)
+            won |= run != 0
+        winner[active[won]] = mover[won] + 1
+        player[active] ^= 1
+        active = active[~won & (plies[active] < rules.cells)]
+    return winner, played
+
+
+def _playouts_grid(rules, boards, heights, player, rng):
+    n = len(boards)
+    rows, columns, connect = rules.rows, rules.columns, rules.connect
+    pad = connect - 1
+    grid = np.zeros((n, rows + 2 * pad, columns + 2 * pad), dtype=np.int8)
+    grid[:, pad:pad + rows, pad:pad + columns] = boards
+    plies = heights.sum(axis=1)
+    winner = np.zeros(n, dtype=np.int8)
+    played = np.zeros((n, 2, columns), dtype=bool)
+    # (4, 2*connect-1) offsets of the cells on each line through a cell:
+    # vertical, horizontal and both diagonals
+    steps = np.arange(-pad, connect)
+    directions = np.array([(1, 0), (0, 1), (1, 1), (1, -1)])
+    row_offsets = directions[:, :1] * steps + pad
+    col_offsets = directions[:, 1:] * steps + pad
+    active = np.flatnonzero(plies < rules.cells)
+    while len(active):
+        col = _random_columns(rules, heights[active], rng)
+        row = heights[active, col]
+        mover = player[active]
+        piece = mover + 1
+        grid[active, row + pad, col + pad] = piece
+        heights[active, col] += 1
+        played[active, mover, col] = True
+        plies[active] += 1
+
+        # Only lines through the new piece can have been completed
+        lines = grid[active[:, None, None], row[:, None, None] + row_offsets,
+                     col[:, None, None] + col_offsets] == piece[:, None, None]
+        runs = np.cumsum(lines, axis=2, dtype=np.int8)
+        runs[:, :, connect:] -= runs[:, :, :-connect]
+        won = (runs[:, :, pad:] == connect).any(axis=(1, 2))
+        winner[active[won]] = piece[won]
+        player[active] ^= 1
+        active = active[~won & (plies[active] < rules.cells)]
+    return winner, played
+
+
+class MCTSNode:
+    # A position in the Monte Carlo tree, reached by `player` playing `move`.
+    # value and amaf_value are summed results for `player`: 1 win, 0.5 draw.
+    __slots__ = ("move", "player", "children", "untried", "visits", "value", "amaf_visits", "amaf_value", "outcome")
+
+    def __init__(self, move, player):
+        self.move = move
+        self.player = player
+        self.children = {}  # column -> MCTSNode
+        self.untried = []  # legal columns without a child yet, next one last
+        self.visits = 0
+        self.value = 0.0
+        self.amaf_visits = 0
+        self.amaf_value = 0.0
+        self.outcome = None  # result for `player` if the game is over here
+
+
+class MonteCarloSearch:
+    # UCT search with optional RAVE for the AI (piece 2). Leaves are chosen
+    # a batch at a time, each path getting a virtual loss (its visits are
+    # counted before its results) so one batch spreads over the tree, and
+    # the whole batch is played out at once by random_playouts. The tree is
+    # kept between moves: the next search starts from the subtree of the
+    # position the game actually reached.
+    def __init__(self, rules=DEFAULT_RULES, exploration=MCTS_EXPLORATION, rave=MCTS_RAVE, seed=None):
+        self.rules = rules
+        self.exploration = exploration
+        self.rave = rave
+        self.rng = np.random.default_rng(seed)
+        self.root = None
+        self.root_moves = []  # columns played to reach the root
+
+    def clear(self):
+        self.root = None
+        self.root_moves = []
+
+    def _root_for(self, bitboard):
+        moves = [col for col, _ in bitboard.moves]
+        root = self.root
+        if root is not None and moves[:len(self.root_moves)] == self.root_moves:
+            for col in moves[len(self.root_moves):]:
+                root = root.children.get(col)
+                if root is None:
+                    break
+        else:
+            root = None
+        if root is None or root.player != 0:
+            root = MCTSNode(None, 0)  # the AI (player 1) is to move
+            root.untried = self._legal_moves(bitboard)
+        self.root, self.root_moves = root, moves
+        return root
+
+    def _legal_moves(self, bb):
+        # Center columns are expanded first
+        return [col for col in reversed(self.rules.center_order) if bb.can_play(col)]
+
+    def search(self, bitboard, budget_ms=None, playouts=None, stop=None):
+        # Searches until the time or playout budget is spent or `stop` is
+        # set, and returns the SearchStats of the most visited move, or None
+        # if there is no legal move
+        root = self._root_for(bitboard)
+        if root.outcome is not None or not (root.untried or root.children):
+            return None
+        start = time.perf_counter()
+        deadline = start + budget_ms / 1000 if budget_ms is not None else None
+        reused = root.visits
+        nodes = done = played = 0
+        per_leaf = MCTS_PLAYOUTS_PER_LEAF
+        while True:
+            paths, boards = [], []
+            for _ in range(MCTS_LEAVES_PER_BATCH):
+                bb = bitboard.copy()
+                path, expanded = self._select(root, bb)
+                nodes += expanded
+                for node in path:
+                    node.visits += per_leaf
+                paths.append(path)
+                boards.append(bb)
+            played += self._evaluate(paths, boards)
+            done += len(paths) * per_leaf
+            if stop is not None and stop.is_set():
+                break
+            if playouts is not None and done >= playouts:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+        stats = SearchStats()
+        stats.source = "mcts"
+        stats.nodes = nodes
+        stats.playouts = played
+        stats.elapsed = time.perf_counter() - start
+        stats.column_scores = {col: round(100 * child.value / child.visits)
+                               for col, child in sorted(root.children.items())}
+        stats.pv = self.principal_variation()
+        stats.move = stats.pv[0]
+        stats.score = stats.column_scores[stats.move]
+        stats.depth = len(stats.pv)
+        log.debug("mcts reused %d of %d root visits", reused, root.visits)
+        return stats
+
+    def principal_variation(self):
+        # Most visited child, then its most visited child...
+        pv = []
+        node = self.root
+        while node.children:
+            node = max(node.children.values(), key=lambda child: child.visits)
+            pv.append(node.move)
+        return pv
+
+    def _select(self, root, bb):
+        # Walks from the root to a leaf, expanding one new child on the way,
+        # and plays the path on `bb`. Returns (path, nodes added).
+        node = root
+        path = [root]
+        while node.outcome is None:
+            if node.untried:
+                col = node.untried.pop()
+                child = MCTSNode(col, 1 - node.player)
+                bb.play(col, child.player)
+                if bb.last_move_won():
+                    child.outcome = 1.0
+                elif bb.is_full():
+                    child.outcome = 0.5
+                else:
+                    child.untried = self._legal_moves(bb)
+                node.children[col] = child
+                path.append(child)
+                return path, 1
+            node = self._best_child(node)
+            bb.play(node.move, node.player)
+            path.append(node)
+        return path, 0
+
+    def _best_child(self, node):
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        best, best_score = None, -float('inf')
+        for child in node.children.values():
+            value = child.value / child.visits
+            if self.rave and child.amaf_visits:
+                beta = math.sqrt(MCTS_RAVE_EQUIVALENCE / (3 * child.visits + MCTS_RAVE_EQUIVALENCE))
+                value = (1 - beta) * value + beta * child.amaf_value / child.amaf_visits
+            score = value + exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def _evaluate(self, paths, boards):
+        # Plays out the batch's open leaves and adds every result up the
+        # paths; visits were already counted by search(). Returns the number
+        # of random playouts.
+        per_leaf = MCTS_PLAYOUTS_PER_LEAF
+        columns = self.rules.columns
+        open_leaves = [i for i, path in enumerate(paths) if path[-1].outcome is None]
+        if open_leaves:
+            winner, played = random_playouts([boards[i] for i in open_leaves],
+                                             [1 - paths[i][-1].player for i in open_leaves], per_leaf, self.rng)
+            # Per leaf: summed result for each player, and for RAVE how many
+            # playouts each player played each column in and their results
+            winner = winner.reshape(len(open_leaves), per_leaf)
+            result = np.stack([(winner == 1) + 0.5 * (winner == 0), (winner == 2) + 0.5 * (winner == 0)], axis=2)
+            totals = result.sum(axis=1).tolist()
+            if self.rave:
+                played = played.reshape(len(open_leaves), per_leaf, 2, columns)
+                amaf_counts = played.sum(axis=1).tolist()
+                amaf_values = np.einsum("lpq,lpqc->lqc", result, played).tolist()
+            else:
+                amaf_counts = amaf_values = [None] * len(open_leaves)
+        results = {i: (totals[k], amaf_counts[k], amaf_values[k]) for k, i in enumerate(open_leaves)}
+
+        for i, path in enumerate(paths):
+            leaf = path[-1]
+            if i in results:
+                total, counts, values = results[i]
+            else:
+                total = [0.0, 0.0]
+                total[leaf.player] = per_leaf * leaf.outcome
+                total[1 - leaf.player] = per_leaf * (1 - leaf.outcome)
+                counts = [[0] * columns, [0] * columns] if self.rave else None
+                values = [[0.0] * columns, [0.0] * columns] if self.rave else None
+            for node in path:
+                node.value += total[node.player]
+            if not self.rave:
+                continue
+            # Every move below a node, in the tree or in the playout, counts
+            # as played first from it
+            for depth in range(len(path) - 1, 0, -1):
+                node = path[depth]
+                counts[node.player][node.move] = per_leaf
+                values[node.player][node.move] = total[node.player]
+                for child in path[depth - 1].children.values():
+                    count = counts[child.player][child.move]
+                    if count:
+                        child.amaf_visits += count
+                        child.amaf_value += values[child.player][child.move]
+        return len(open_leaves) * per_leaf
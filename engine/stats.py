@@ -0,0 +1,51 @@
+"""What a search reports back."""
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchStats:
+    # What the AI's last move decision cost and what it saw
+    def __init__(self):
+        self.source = None  # "search", "book", "tablebase", "analysis" or "mcts"
+        self.move = None
+        self.score = 0  # for "mcts", the move's expected result in percent
+        self.depth = 0  # deepest completed iteration
+        self.nodes = 0
+        self.playouts = 0
+        self.cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.elapsed = 0.0  # seconds
+        self.pv = []  # principal variation, starting with the move played
+        self.column_scores = {}  # column -> score at the last completed depth
+        self.bounds = set()  # columns whose score is only an upper bound
+
+    @property
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def playouts_per_sec(self):
+        return self.playouts / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "source": self.source,
+            "move": self.move,
+            "score": self.score,
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "cutoffs": self.cutoffs,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "elapsed_ms": round(self.elapsed * 1000, 2),
+            "nps": round(self.nps),
+            "playouts": self.playouts,
+            "playouts_per_sec": round(self.playouts_per_sec),
+            "pv": self.pv,
+            "column_scores": {str(col): score for col, score in self.column_scores.items()},
+            "bounds": sorted(self.bounds),
+        }
+
@@ -0,0 +1,193 @@
+"""Transposition table, opening book and endgame tablebase."""
+import mmap
+import os
+import struct
+
+from .board import COLUMN_COUNT, ROW_COUNT
+
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # next to script.py
+
+# Transposition table
+TT_SIZE = 262139  # slots; a prime keeps key % size well spread
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+# Opening book: header, then records sorted by canonical key
+OPENING_BOOK_PATH = os.path.join(DATA_DIR, "opening_book.bin")
+BOOK_MAGIC = b"C4BK"
+BOOK_VERSION = 1
+BOOK_HEADER = struct.Struct("<4sBBBBI")  # magic, version, rows, columns, plies, record count
+BOOK_RECORD = struct.Struct("<QBBh")  # key, best move, search depth, score
+BOOK_WIN = 32767  # stored score of a proven win, -BOOK_WIN of a proven loss; WIN_SCORE does not fit an int16
+
+# Endgame tablebase: header, then records sorted by key. A record is one
+# little-endian uint64: the position's canonical key from the side to move
+# << 8 | result << 6 | plies to the end of the game under best play.
+TABLEBASE_PATH = os.path.join(DATA_DIR, "endgame_tablebase.bin")
+TABLEBASE_MAGIC = b"C4TB"
+TABLEBASE_VERSION = 1
+TABLEBASE_HEADER = struct.Struct("<4sBBBBI")  # magic, version, rows, columns, max empty cells, record count
+TB_LOSS, TB_DRAW, TB_WIN = 0, 1, 2  # tablebase results for the side to move
+
+
+class TranspositionTable:
+    # Fixed number of slots indexed by key % size. A slot is overwritten when
+    # it is empty, left over from an earlier search, or the new result was
+    # searched at least as deep (depth-preferred replacement with aging).
+    def __init__(self, size=TT_SIZE):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = self.hits = self.stores = self.evictions = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key):
+        # Returns (depth, flag, value, best_move) or None
+        self.probes += 1
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1:5]
+        return None
+
+    def store(self, key, depth, flag, value, best_move):
+        index = key % self.size
+        old = self.slots[index]
+        if old is not None and old[0] != key:
+            if old[5] == self.generation and old[1] > depth:
+                return
+            self.evictions += 1
+        self.slots[index] = (key, depth, flag, value, best_move, self.generation)
+        self.stores += 1
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate(),
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+
+class OpeningBook:
+    # Read-only view of a book file written by build_book.py. The file is
+    # memory-mapped and searched in place, so opening it costs nothing.
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < BOOK_HEADER.size:
+                raise ValueError(f"{path}: not an opening book")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, columns, self.plies, self.count = BOOK_HEADER.unpack_from(self.map)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            raise ValueError(f"{path}: not an opening book")
+        if (rows, columns) != (ROW_COUNT, COLUMN_COUNT):
+            raise ValueError(f"{path}: book is for a {rows}x{columns} board")
+        if len(self.map) != BOOK_HEADER.size + self.count * BOOK_RECORD.size:
+            raise ValueError(f"{path}: truncated opening book")
+
+    def __len__(self):
+        return self.count
+
+    def _key_at(self, index):
+        return struct.unpack_from("<Q", self.map, BOOK_HEADER.size + index * BOOK_RECORD.size)[0]
+
+    def lookup(self, key):
+        # Returns (move, depth, score) for a canonical key, or None
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key_at(lo) == key:
+            return BOOK_RECORD.unpack_from(self.map, BOOK_HEADER.size + lo * BOOK_RECORD.size)[1:]
+        return None
+
+    def close(self):
+        self.map.close()
+
+
+class Tablebase:
+    # Read-only view of a tablebase file written by build_tablebase.py:
+    # exact results of endgame positions with at most `empty` empty cells.
+    # The records are memory-mapped and binary searched in place.
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < TABLEBASE_HEADER.size:
+                raise ValueError(f"{path}: not a tablebase")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, columns, self.empty, self.count = TABLEBASE_HEADER.unpack_from(self.map)
+        if magic != TABLEBASE_MAGIC or version != TABLEBASE_VERSION:
+            raise ValueError(f"{path}: not a tablebase")
+        if (rows, columns) != (ROW_COUNT, COLUMN_COUNT):
+            raise ValueError(f"{path}: tablebase is for a {rows}x{columns} board")
+        if len(self.map) != TABLEBASE_HEADER.size + self.count * 8:
+            raise ValueError(f"{path}: truncated tablebase")
+        import numpy as np
+        self.records = np.frombuffer(self.map, dtype="<u8", count=self.count, offset=TABLEBASE_HEADER.size)
+        self.probes = 0
+        self.hits = 0
+
+    def __len__(self):
+        return self.count
+
+    def probe(self, bitboard, player):
+        # (result, plies to the end) for `player` to move, or None
+        self.probes += 1
+        key = bitboard.canonical_key(player)[0]
+        index = int(self.records.searchsorted(self.records.dtype.type(key << 8)))
+        if index < self.count:
+            record = int(self.records[index])
+            if record >> 8 == key:
+                self.hits += 1
+                return record >> 6 & 3, record & 63
+        return None
+
+    def close(self):
+        self.records = None  # the map cannot close while an array uses it
+        self.map.close()
+
+
+_default_book = False  # not looked for yet
+_default_tablebase = False
+
+
+def default_opening_book():
+    # The book next to this file, shared by every game in the process
+    global _default_book
+    if _default_book is False:
+        try:
+            _default_book = OpeningBook(OPENING_BOOK_PATH)
+        except (OSError, ValueError):
+            _default_book = None
+    return _default_book
+
+
+def default_tablebase():
+    # The tablebase next to this file, shared by every game in the process
+    global _default_tablebase
+    if _default_tablebase is False:
+        try:
+            _default_tablebase = Tablebase(TABLEBASE_PATH)
+        except (OSError, ValueError):
+            _default_tablebase = None
+    return _default_tablebase
@@ -0,0 +1,363 @@
+"""Framed binary protocol for online play.
+
+Every message is a 7-byte header followed by its payload:
+
+    length  uint16  payload size in bytes
+    type    uint8   one of the MSG_* constants
+    seq     uint32  per-connection, per-direction sequence number
+
+all little-endian. MOVE frames are acknowledged by the receiver so the
+sender can measure delivery time, and PING/PONG heartbeats measure RTT.
+
+A spectator stream starts with a SNAPSHOT of the moves so far, followed by
+one MOVE frame per move whose seq is the move's ply, so the same frame
+bytes serve every spectator.
+"""
+import logging
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from engine import COLUMN_COUNT
+
+
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("<HBI")
+MAX_PAYLOAD = 0xFFFF
+RECV_SIZE = 65536
+HEARTBEAT_SECONDS = 1.0
+RTT_SAMPLES = 64
+RTT_SMOOTHING = 0.125  # weight of a new sample in the smoothed RTT, as in TCP
+MATCH_SERVER_PORT = 5556  # server.py
+SPECTATE_PORT = 5557
+SPECTATOR_BACKLOG = 256  # frames queued for one spectator before it is dropped as too slow
+
+MSG_HELLO = 1  # payload: uint8 protocol version
+MSG_MOVE = 2  # payload: uint8 column
+MSG_ACK = 3  # payload: uint32 seq of the acknowledged MOVE
+MSG_PING = 4  # payload: float64 sender's clock
+MSG_PONG = 5  # payload: the PING payload, echoed
+MSG_BYE = 6  # no payload, the peer is closing
+MSG_JOIN = 7  # client -> match server: queue me for a game
+MSG_START = 8  # match server -> client: payload uint8 side (0 moves first), uint32 match id
+MSG_REJECT = 9  # match server -> client: payload uint32 seq of an illegal MOVE
+MSG_SNAPSHOT = 10  # host -> spectator: payload uint8 protocol version, then every move so far
+
+START_PAYLOAD = struct.Struct("<BI")
+
+log = logging.getLogger("connect4")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(msg_type, seq, payload=b""):
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"payload of {len(payload)} bytes is too large")
+    return HEADER.pack(len(payload), msg_type, seq) + payload
+
+
+class FrameDecoder:
+    # Reassembles frames from a byte stream; TCP may split a frame across
+    # reads or deliver several in one
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        # Returns the (type, seq, payload) frames completed by `data`
+        self.buffer += data
+        frames = []
+        offset = 0
+        while len(self.buffer) - offset >= HEADER.size:
+            length, msg_type, seq = HEADER.unpack_from(self.buffer, offset)
+            end = offset + HEADER.size + length
+            if end > len(self.buffer):
+                break
+            frames.append((msg_type, seq, bytes(self.buffer[offset + HEADER.size:end])))
+            offset = end
+        del self.buffer[:offset]
+        return frames
+
+
+class Connection:
+    # One peer over a connected TCP socket. start() reads on a background
+    # thread until the peer goes away and calls on_move(col) for every move
+    # received, in order, and on_start(side, match_id) when a match server
+    # pairs us with an opponent. As a spectator it gets on_snapshot(moves)
+    # first and sends nothing back.
+    def __init__(self, sock, on_move=None, on_start=None, on_snapshot=None):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.on_move = on_move
+        self.on_start = on_start
+        self.on_snapshot = on_snapshot
+        self.spectating = False
+        self.decoder = FrameDecoder()
+        self.send_lock = threading.Lock()
+        self.send_seq = 0
+        self.recv_seq = 0
+        self.closed = threading.Event()
+        self.rtt = None  # seconds, last heartbeat
+        self.srtt = None  # smoothed
+        self.rtts = deque(maxlen=RTT_SAMPLES)
+        self.move_rtts = deque(maxlen=RTT_SAMPLES)  # MOVE sent -> ACK received
+        self._unacked = {}  # seq -> send time
+
+    def send(self, msg_type, payload=b""):
+        # Returns the frame's sequence number, or None if the peer is gone
+        with self.send_lock:
+            seq = self.send_seq
+            self.send_seq += 1
+            if msg_type == MSG_MOVE:
+                self._unacked[seq] = time.perf_counter()
+            try:
+                self.sock.sendall(encode_frame(msg_type, seq, payload))
+            except OSError:
+                self.close()
+                return None
+        return seq
+
+    def send_move(self, col):
+        return self.send(MSG_MOVE, bytes([col]))
+
+    def join(self):
+        return self.send(MSG_JOIN)
+
+    def start(self, spectate=False):
+        if not spectate:
+            self.send(MSG_HELLO, bytes([PROTOCOL_VERSION]))
+            threading.Thread(target=self._heartbeat, daemon=True).start()
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def _run(self):
+        try:
+            while not self.closed.is_set():
+                data = self.sock.recv(RECV_SIZE)
+                if not data:
+                    break
+                for msg_type, seq, payload in self.decoder.feed(data):
+                    self._handle(msg_type, seq, payload)
+        except (OSError, ProtocolError) as e:
+            if not self.closed.is_set():
+                log.warning("connection lost: %s", e)
+        finally:
+            self.close()
+
+    def close(self, notify=False):
+        if self.closed.is_set():
+            return
+        if notify:
+            self.send(MSG_BYE)
+        self.closed.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _handle(self, msg_type, seq, payload):
+        if seq != self.recv_seq:
+            log.warning("expected frame %d, got %d", self.recv_seq, seq)
+        self.recv_seq = seq + 1
+
+        if msg_type == MSG_MOVE:
+            if len(payload) != 1:
+                raise ProtocolError("bad MOVE payload")
+            if payload[0] >= COLUMN_COUNT:
+                raise ProtocolError(f"MOVE to column {payload[0]}")
+            if not self.spectating:
+                self.send(MSG_ACK, struct.pack("<I", seq))
+            if self.on_move is not None:
+                self.on_move(payload[0])
+        elif msg_type == MSG_ACK:
+            sent = self._unacked.pop(struct.unpack("<I", payload)[0], None)
+            if sent is not None:
+                self.move_rtts.append(time.perf_counter() - sent)
+        elif msg_type == MSG_PING:
+            self.send(MSG_PONG, payload)
+        elif msg_type == MSG_PONG:
+            self._record_rtt(time.perf_counter() - struct.unpack("<d", payload)[0])
+        elif msg_type == MSG_HELLO:
+            if payload[:1] != bytes([PROTOCOL_VERSION]):
+                raise ProtocolError(f"peer speaks protocol version {payload[0] if payload else None}")
+        elif msg_type == MSG_START:
+            side, match_id = START_PAYLOAD.unpack(payload)
+            if self.on_start is not None:
+                self.on_start(side, match_id)
+        elif msg_type == MSG_SNAPSHOT:
+            if payload[:1] != bytes([PROTOCOL_VERSION]):
+                raise ProtocolError(f"host speaks protocol version {payload[0] if payload else None}")
+            if any(col >= COLUMN_COUNT for col in payload[1:]):
+                raise ProtocolError("SNAPSHOT move outside the board")
+            self.spectating = True
+            self.recv_seq = len(payload) - 1  # the ply of the next move
+            if self.on_snapshot is not None:
+                self.on_snapshot(list(payload[1:]))
+        elif msg_type == MSG_REJECT:
+            log.warning("server rejected move frame %d", struct.unpack("<I", payload)[0])
+        elif msg_type == MSG_BYE:
+            self.close()
+        else:
+            raise ProtocolError(f"unknown message type {msg_type}")
+
+    def _record_rtt(self, rtt):
+        self.rtt = rtt
+        self.rtts.append(rtt)
+        if self.srtt is None:
+            self.srtt = rtt
+        else:
+            self.srtt += RTT_SMOOTHING * (rtt - self.srtt)
+
+    def _heartbeat(self):
+        while not self.closed.wait(HEARTBEAT_SECONDS):
+            if self.send(MSG_PING, struct.pack("<d", time.perf_counter())) is None:
+                break
+
+
+class Broadcaster:
+    # Streams one game's moves to any number of spectators. publish() encodes
+    # each move once and queues the same bytes object for every spectator;
+    # one thread writes the queues out over non-blocking sockets, so a slow
+    # spectator only grows its own queue and is dropped once that passes
+    # SPECTATOR_BACKLOG frames. The players never wait on a spectator.
+    def __init__(self, port=SPECTATE_PORT, host="0.0.0.0"):
+        self.listener = socket.create_server((host, port), backlog=128)
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+        self.moves = bytearray()
+        self.subscribers = {}  # socket -> deque of frames not sent yet
+        self.lock = threading.Lock()  # guards moves and the subscriber table
+        self.slow = set()  # sockets over the backlog, dropped by the writer thread
+        self.dropped = 0
+        self.closed = threading.Event()
+        self.selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        for sock in (self._wake_r, self._wake_w):
+            sock.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.selector.register(self._wake_r, selectors.EVENT_READ)
+        self._writing = set()  # sockets registered for EVENT_WRITE
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def publish(self, col):
+        with self.lock:
+            frame = encode_frame(MSG_MOVE, len(self.moves), bytes([col]))
+            self.moves.append(col)
+            for sock, pending in self.subscribers.items():
+                if len(pending) >= SPECTATOR_BACKLOG:
+                    self.slow.add(sock)
+                else:
+                    pending.append(frame)
+        self._wake()
+
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # already awake, or closed
+
+    def _run(self):
+        try:
+            while not self.closed.is_set():
+                for key, events in self.selector.select():
+                    sock = key.fileobj
+                    if sock is self.listener:
+                        self._accept()
+                    elif sock is self._wake_r:
+                        self._drain(sock)
+                        self._flush_all()
+                    elif sock in self.subscribers:
+                        if events & selectors.EVENT_READ and not self._drain(sock):
+                            self._drop(sock)
+                        elif events & selectors.EVENT_WRITE:
+                            self._flush(sock)
+        finally:
+            for sock in list(self.subscribers):
+                self._drop(sock)
+            for sock in (self.listener, self._wake_r, self._wake_w):
+                sock.close()
+            self.selector.close()
+
+    def _accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock:
+            snapshot = encode_frame(MSG_SNAPSHOT, 0, bytes([PROTOCOL_VERSION]) + bytes(self.moves))
+            self.subscribers[sock] = deque([snapshot])
+        self.selector.register(sock, selectors.EVENT_READ)
+        self._flush(sock)
+
+    def _drain(self, sock):
+        # Spectators send nothing we need; returns False once the peer is gone
+        try:
+            while True:
+                data = sock.recv(RECV_SIZE)
+                if not data:
+                    return False
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def _flush_all(self):
+        for sock in list(self.slow):
+            self.dropped += 1
+            self._drop(sock)
+        self.slow.clear()
+        for sock in list(self.subscribers):
+            if sock not in self._writing:
+                self._flush(sock)
+
+    def _flush(self, sock):
+        # Sends what the socket takes without blocking; the rest waits for
+        # EVENT_WRITE. publish() only appends, so popping from the left here
+        # is safe without the lock.
+        pending = self.subscribers.get(sock)
+        if pending is None:
+            return
+        if pending:
+            frames = []
+            while pending:
+                frames.append(pending.popleft())
+            data = b"".join(frames) if len(frames) > 1 else frames[0]
+            try:
+                sent = sock.send(data)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self._drop(sock)
+                return
+            if sent < len(data):
+                pending.appendleft(data[sent:])
+        if pending and sock not in self._writing:
+            self.selector.modify(sock, selectors.EVENT_READ | selectors.EVENT_WRITE)
+            self._writing.add(sock)
+        elif not pending and sock in self._writing:
+            self.selector.modify(sock, selectors.EVENT_READ)
+            self._writing.discard(sock)
+
+    def _drop(self, sock):
+        with self.lock:
+            if self.subscribers.pop(sock, None) is None:
+                return
+        self._writing.discard(sock)
+        self.selector.unregister(sock)
+        sock.close()
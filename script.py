@@ -1,14 +1,19 @@
 import pygame
 import sys
-import random
+import atexit
 import socket
 import threading
+import queue
+import logging
+import os
+import time
 import numpy as np
 from collections import deque
-import time
 
-
-pygame.init()
+from engine import AI_TIME_BUDGETS, COLUMN_COUNT, ROW_COUNT, WIN_SCORE, Connect4Game, SearchStats, SearchTimeout
+from engine.gamelog import GameLogWriter, GameRecord
+from protocol import MATCH_SERVER_PORT, SPECTATE_PORT, Broadcaster, Connection
+from telemetry import from_environment as telemetry_from_environment
 
 
 BLUE = (70, 130, 180)
@@ -21,289 +26,514 @@ RED = (220, 80, 80)
 YELLOW = (240, 230, 140)
 GREEN = (100, 180, 100)
 
+AI_MOVE_EVENT = pygame.USEREVENT + 1  # posted by AIWorker with .col, .token, .stats, .started and .think
+AI_MOVE_DELAY_MS = 500  # minimum time before the AI's piece appears, for UX
+AI_WORKERS_ENV = "CONNECT4_AI_WORKERS"  # processes for the hard AI's parallel root search
+NET_MOVE_EVENT = pygame.USEREVENT + 2  # posted by the receive thread with .col, .token and .received
+ANALYSIS_EVENT = pygame.USEREVENT + 3  # posted by Analyzer with .token and .stats after every depth
+
+# Game loop timing
+ACTIVE_FPS = 60
+IDLE_AFTER_MS = 1000  # no input for this long switches to idle mode
+IDLE_FRAME_MS = 100  # in idle mode, wake up at least this often
+FRAME_SAMPLES = 120  # frames kept for the draw time / fps readout
+DISPLAY_SAMPLES = 64  # network moves kept for the receipt-to-display readout
+TEXT_CACHE_SIZE = 256
+
 
-ROW_COUNT = 6
-COLUMN_COUNT = 7
 SQUARESIZE = 100
 RADIUS = int(SQUARESIZE/2 - 5)
 width = COLUMN_COUNT * SQUARESIZE
 height = (ROW_COUNT+1) * SQUARESIZE
 size = (width, height)
 
+font = None  # set by init_display()
+large_font = None
+small_font = None
+
+log = logging.getLogger("connect4")
+text_cache = {}
 
-font = pygame.font.SysFont("Arial", 30)
-large_font = pygame.font.SysFont("Arial", 50)
 
-class Connect4Game:
+class GameSession(Connect4Game):
+    # The game as the GUI plays it: the engine's game plus the online
+    # connections and what the board shows on top of it
     def __init__(self):
-        self.board = np.zeros((ROW_COUNT, COLUMN_COUNT))
-        self.game_over = False
-        self.turn = 0  # 0 for player 1, 1 for player 2
-        self.winner = None
-        self.mode = None  # Will be set to "1v1", "1vAI", or "online"
-        self.ai_difficulty = "medium"  # easy, medium, hard
-        self.opponent_move = None  # For online play
+        super().__init__()
+        self.show_analysis = False  # draw_board overlay with last_search
+        self.show_hints = False  # draw_board shows the Analyzer's column scores
+        self.hints = None  # SearchStats of the Analyzer's deepest search of this position
         self.server_socket = None
         self.client_socket = None
+        self.connection = None  # protocol.Connection to the online opponent
+        self.broadcaster = None  # protocol.Broadcaster streaming our moves to spectators
+        self.net_token = 0  # NET_MOVE_EVENTs with an older token are stale
+        self.display_latencies = deque(maxlen=DISPLAY_SAMPLES)  # seconds, move received -> drawn
         self.is_host = False
+        self.ai_workers = int(os.environ.get(AI_WORKERS_ENV, self.ai_workers))
 
     def reset(self):
-        self.board = np.zeros((ROW_COUNT, COLUMN_COUNT))
-        self.game_over = False
-        self.turn = 0
-        self.winner = None
-
-    def drop_piece(self, row, col, piece):
-        self.board[row][col] = piece
-
-    def is_valid_location(self, col):
-        return self.board[ROW_COUNT-1][col] == 0
-
-    def get_next_open_row(self, col):
-        for r in range(ROW_COUNT):
-            if self.board[r][col] == 0:
-                return r
-
-    def winning_move(self, piece):
-        # Check horizontal locations
-        for c in range(COLUMN_COUNT-3):
-            for r in range(ROW_COUNT):
-                if self.board[r][c] == piece and self.board[r][c+1] == piece and self.board[r][c+2] == piece and self.board[r][c+3] == piece:
-                    return True
-
-      
-        for c in range(COLUMN_COUNT):
-            for r in range(ROW_COUNT-3):
-                if self.board[r][c] == piece and self.board[r+1][c] == piece and self.board[r+2][c] == piece and self.board[r+3][c] == piece:
-                    return True
-
-        
-        for c in range(COLUMN_COUNT-3):
-            for r in range(ROW_COUNT-3):
-                if self.board[r][c] == piece and self.board[r+1][c+1] == piece and self.board[r+2][c+2] == piece and self.board[r+3][c+3] == piece:
-                    return True
-
-        
-        for c in range(COLUMN_COUNT-3):
-            for r in range(3, ROW_COUNT):
-                if self.board[r][c] == piece and self.board[r-1][c+1] == piece and self.board[r-2][c+2] == piece and self.board[r-3][c+3] == piece:
-                    return True
-        return False
-
-    def is_board_full(self):
-        return all(self.board[ROW_COUNT-1][c] != 0 for c in range(COLUMN_COUNT))
+        self.close_connection()
+        super().reset()
+        self.hints = None
 
     def make_move(self, col):
-        if self.game_over or not self.is_valid_location(col):
+        if not super().make_move(col):
             return False
-
-        row = self.get_next_open_row(col)
-        piece = self.turn + 1
-        self.drop_piece(row, col, piece)
-
-        if self.winning_move(piece):
-            self.game_over = True
-            self.winner = piece
-        elif self.is_board_full():
-            self.game_over = True
-            self.winner = 0  # Draw
-
-        self.turn = (self.turn + 1) % 2
+        if self.broadcaster is not None:
+            self.broadcaster.publish(col)
         return True
 
-    def ai_move(self):
-        if self.game_over:
-            return
-
-        if self.ai_difficulty == "easy":
-            return self.random_ai()
-        elif self.ai_difficulty == "medium":
-            return self.medium_ai()
-        else:
-            return self.hard_ai()
-
-    def random_ai(self):
-        valid_locations = [col for col in range(COLUMN_COUNT) if self.is_valid_location(col)]
-        if valid_locations:
-            col = random.choice(valid_locations)
-            self.make_move(col)
-            return col
-        return None
-
-    def medium_ai(self):
-       
-        for col in range(COLUMN_COUNT):
-            if self.is_valid_location(col):
-                temp_row = self.get_next_open_row(col)
-                self.drop_piece(temp_row, col, 2)
-                if self.winning_move(2):
-                    self.board[temp_row][col] = 0  # Undo move
-                    self.make_move(col)
-                    return col
-                self.board[temp_row][col] = 0  # Undo move
-
-        
-        for col in range(COLUMN_COUNT):
-            if self.is_valid_location(col):
-                temp_row = self.get_next_open_row(col)
-                self.drop_piece(temp_row, col, 1)
-                if self.winning_move(1):
-                    self.board[temp_row][col] = 0  # Undo move
-                    self.make_move(col)
-                    return col
-                self.board[temp_row][col] = 0  # Undo move
-
-       
-        return self.random_ai()
-
-    def hard_ai(self):
-        
-        best_score = -float('inf')
-        best_col = self.random_ai()  # Default to random if something goes wrong
-
-        for col in range(COLUMN_COUNT):
-            if self.is_valid_location(col):
-                row = self.get_next_open_row(col)
-                self.drop_piece(row, col, 2)
-                score = self.minimax(self.board, 3, -float('inf'), float('inf'), False)
-                self.board[row][col] = 0  # Undo move
-                if score > best_score:
-                    best_score = score
-                    best_col = col
-
-        self.make_move(best_col)
-        return best_col
-
-    def minimax(self, board, depth, alpha, beta, maximizing_player):
-        valid_locations = [col for col in range(COLUMN_COUNT) if self.is_valid_location(col)]
-        is_terminal = self.winning_move(1) or self.winning_move(2) or len(valid_locations) == 0
-
-        if depth == 0 or is_terminal:
-            if self.winning_move(2):
-                return 100000
-            elif self.winning_move(1):
-                return -100000
-            else:
-                return 0
-
-        if maximizing_player:
-            value = -float('inf')
-            for col in valid_locations:
-                row = self.get_next_open_row(col)
-                self.drop_piece(row, col, 2)
-                new_score = self.minimax(board, depth-1, alpha, beta, False)
-                self.board[row][col] = 0
-                value = max(value, new_score)
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-            return value
-        else:
-            value = float('inf')
-            for col in valid_locations:
-                row = self.get_next_open_row(col)
-                self.drop_piece(row, col, 1)
-                new_score = self.minimax(board, depth-1, alpha, beta, True)
-                self.board[row][col] = 0
-                value = min(value, new_score)
-                beta = min(beta, value)
-                if alpha >= beta:
-                    break
-            return value
-
     def start_server(self, port=5555):
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind(('0.0.0.0', port))
         self.server_socket.listen(1)
         self.is_host = True
+        self.start_broadcast()
         
-        def accept_connection():
-            self.client_socket, addr = self.server_socket.accept()
+        def accept_connection(server_socket):
+            # close_connection() shuts the listening socket down, which
+            # wakes accept() with an error
+            try:
+                self.client_socket, addr = server_socket.accept()
+            except OSError:
+                return
             print(f"Connection from {addr}")
-            
-            while not self.game_over:
-                try:
-                    data = self.client_socket.recv(1024).decode()
-                    if data:
-                        col = int(data)
-                        self.opponent_move = col
-                except:
-                    break
+            self._open_connection(self.client_socket)
         
-        threading.Thread(target=accept_connection, daemon=True).start()
+        threading.Thread(target=accept_connection, args=(self.server_socket,), daemon=True).start()
 
     def connect_to_server(self, host, port=5555):
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.client_socket.connect((host, port))
-        
-        def receive_moves():
-            while not self.game_over:
-                try:
-                    data = self.client_socket.recv(1024).decode()
-                    if data:
-                        col = int(data)
-                        self.opponent_move = col
-                except:
-                    break
-        
-        threading.Thread(target=receive_moves, daemon=True).start()
+        self._open_connection(self.client_socket)
 
-    def send_move(self, col):
-        if self.client_socket:
+    def connect_to_match_server(self, host, port=MATCH_SERVER_PORT):
+        # Thin client of server.py: the server pairs players and checks
+        # every move; which side we play arrives with the START message
+        self.is_host = False
+        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.client_socket.connect((host, port))
+        self._open_connection(self.client_socket, on_start=self._start_match)
+        self.connection.join()
+
+    def start_broadcast(self, port=SPECTATE_PORT):
+        # Lets spectators watch this game; see spectate()
+        try:
+            self.broadcaster = Broadcaster(port)
+        except OSError as e:
+            log.warning("spectators cannot connect: %s", e)
+
+    def spectate(self, host, port=SPECTATE_PORT):
+        # Watch a hosted game: the moves so far arrive as a snapshot, then
+        # each new move, all as NET_MOVE_EVENTs
+        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.client_socket.connect((host, port))
+        token = self.net_token
+        self.connection = Connection(self.client_socket, on_move=lambda col: self._receive_move(col, token),
+                                     on_snapshot=lambda moves: self._receive_snapshot(moves, token)).start(spectate=True)
+
+    def _open_connection(self, sock, on_start=None):
+        token = self.net_token
+        self.connection = Connection(sock, on_move=lambda col: self._receive_move(col, token), on_start=on_start).start()
+
+    def _start_match(self, side, match_id):
+        # The side that moves first plays the host's part in online mode
+        self.is_host = side == 0
+
+    def _receive_move(self, col, token):
+        # Runs on the receive thread; the event queue hands every move to
+        # the game loop in order and wakes it if it is idle
+        pygame.event.post(pygame.event.Event(NET_MOVE_EVENT, col=col, token=token, received=time.perf_counter()))
+
+    def _receive_snapshot(self, moves, token):
+        for col in moves:
+            self._receive_move(col, token)
+
+    def close_connection(self):
+        # Ends the receive, heartbeat and accept threads; moves still in
+        # the event queue are dropped by their token
+        self.net_token += 1
+        if self.connection is not None:
+            self.connection.close(notify=True)
+            self.connection = None
+        if self.broadcaster is not None:
+            self.broadcaster.close()
+            self.broadcaster = None
+        if self.server_socket is not None:
             try:
-                self.client_socket.send(str(col).encode())
-            except:
+                self.server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
                 pass
+            self.server_socket.close()
+            self.server_socket = None
+        if self.client_socket is not None:
+            self.client_socket.close()
+            self.client_socket = None
 
-def draw_board(screen, game):
-    screen.fill(BLUE)
-    
-   
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT):
-            pygame.draw.rect(screen, LIGHT_BLUE, (c*SQUARESIZE, (r+1)*SQUARESIZE, SQUARESIZE, SQUARESIZE))
-            pygame.draw.circle(screen, WHITE, (int(c*SQUARESIZE+SQUARESIZE/2), int((r+1)*SQUARESIZE+SQUARESIZE/2)), RADIUS)
-    
-   
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT):
-            if game.board[r][c] == 1:
-                pygame.draw.circle(screen, RED, (int(c*SQUARESIZE+SQUARESIZE/2), height-int(r*SQUARESIZE+SQUARESIZE/2)), RADIUS)
-            elif game.board[r][c] == 2:
-                pygame.draw.circle(screen, YELLOW, (int(c*SQUARESIZE+SQUARESIZE/2), height-int(r*SQUARESIZE+SQUARESIZE/2)), RADIUS)
-    
-   
-    posx = pygame.mouse.get_pos()[0]
-    if game.turn == 0:
-        pygame.draw.circle(screen, RED, (posx, int(SQUARESIZE/2)), RADIUS)
-    else:
-        if game.mode == "1v1":
-            pygame.draw.circle(screen, YELLOW, (posx, int(SQUARESIZE/2)), RADIUS)
-    
-  
+    def send_move(self, col):
+        if self.connection:
+            self.connection.send_move(col)
+
+
+class AIJob:
+    def __init__(self, game, game_id, ponder=False):
+        self.bitboard = game.bitboard.copy()  # carries the game's Rules
+        self.difficulty = game.ai_difficulty
+        self.budget_ms = game.ai_time_budget_ms
+        self.ai_workers = game.ai_workers
+        self.game_id = game_id
+        self.ponder = ponder
+        self.ponder_move = None  # set by the worker once it has a prediction
+        self.token = None
+        self.started = time.perf_counter()
+        self.stop = threading.Event()  # ends the search, result is still posted
+        self.cancelled = threading.Event()  # drops the job entirely
+        self.wake = threading.Event()  # ponder hit or cancel
+
+
+class AIWorker:
+    # Runs AI searches on a background thread and posts each chosen column
+    # as an AI_MOVE_EVENT, so the main loop keeps drawing and handling input.
+    # While the human thinks, a hard AI ponders on its predicted reply; if
+    # that reply is played the running search becomes the AI's answer.
+    def __init__(self):
+        self.engine = Connect4Game()  # search-only copy, owns the AI's table
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.job = None
+        self.token = 0
+        self.game_id = 0
+        self._engine_game_id = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def new_game(self):
+        self.cancel()
+        self.game_id += 1
+
+    def cancel(self):
+        with self.lock:
+            self.token += 1
+            if self.job is not None:
+                self.job.cancelled.set()
+                self.job.stop.set()
+                self.job.wake.set()
+            self.job = None
+
+    def request_move(self, game):
+        self._submit(AIJob(game, self.game_id))
+
+    def ponder(self, game):
+        if game.ai_difficulty == "hard" and not game.game_over:
+            self._submit(AIJob(game, self.game_id, ponder=True))
+
+    def on_human_move(self, game, col):
+        if game.game_over:  # nothing left to answer; stop any ponder search
+            self.cancel()
+            return
+        with self.lock:
+            job = self.job
+            hit = job is not None and job.ponder and job.ponder_move == col and not job.cancelled.is_set()
+            if hit:
+                job.started = time.perf_counter()
+                timer = threading.Timer(job.budget_ms / 1000, job.stop.set)
+                timer.daemon = True
+                timer.start()
+                job.wake.set()
+        if not hit:
+            self.request_move(game)
+
+    def _submit(self, job):
+        self.cancel()
+        with self.lock:
+            job.token = self.token
+            self.job = job
+        self.jobs.put(job)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job.cancelled.is_set():
+                continue
+
+            engine = self.engine
+            if job.bitboard.rules != engine.rules:
+                engine.shutdown_pool()
+                engine = self.engine = Connect4Game(rules=job.bitboard.rules)
+            if job.game_id != self._engine_game_id:
+                engine.reset()
+                self._engine_game_id = job.game_id
+            engine.bitboard = job.bitboard
+            engine.turn = 1
+            engine.game_over = False
+            engine.ai_difficulty = job.difficulty
+            engine.ai_workers = job.ai_workers
+
+            if job.ponder:
+                predicted = engine.table_move()
+                if predicted is None:
+                    continue
+                engine.bitboard.play(predicted, 0)
+                with self.lock:
+                    job.ponder_move = predicted
+                col = engine.lookup_move()
+                if col is None:
+                    col = engine.iterative_deepening(None, stop=job.stop)
+                job.wake.wait()
+            elif job.difficulty == "hard":
+                col = engine.lookup_move()
+                if col is None:
+                    col = engine.iterative_deepening(job.budget_ms, stop=job.stop)
+            elif job.difficulty == "mcts":
+                col = engine.mcts_move(job.budget_ms, stop=job.stop)
+            else:
+                col = engine.ai_move()
+            think = time.perf_counter() - job.started
+
+            remaining = AI_MOVE_DELAY_MS / 1000 - think
+            if remaining > 0:
+                job.cancelled.wait(remaining)
+            if col is not None and not job.cancelled.is_set():
+                pygame.event.post(pygame.event.Event(AI_MOVE_EVENT, col=col, token=job.token, stats=engine.last_search,
+                                                     started=job.started, think=think))
+
+
+class Analyzer:
+    # Hint engine: searches the current position of a game in the background,
+    # deeper and deeper, and posts every column's score as an ANALYSIS_EVENT
+    # after each depth. Its table lives across moves, so after a move the
+    # subtree already searched below it is still in the table and the first
+    # depths of the new position cost next to nothing.
+    def __init__(self):
+        self.engine = Connect4Game()
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.token = 0
+        self.stop = None  # threading.Event of the running analysis
+        self.board = None  # bitboard and ply being analyzed, see follow()
+        self.ply = None
+        self.game_id = 0
+        self._engine_game_id = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def new_game(self):
+        self.cancel()
+        self.game_id += 1
+
+    def cancel(self):
+        with self.lock:
+            self.token += 1
+            if self.stop is not None:
+                self.stop.set()
+            self.stop = None
+            self.board = self.ply = None
+
+    def follow(self, game):
+        # Call every frame; restarts the analysis when the game has moved and
+        # returns True when it did
+        bb = game.bitboard
+        if bb is self.board and bb.ply == self.ply:
+            return False
+        self.cancel()
+        with self.lock:
+            self.board, self.ply = bb, bb.ply
+            if not game.game_over:
+                self.stop = threading.Event()
+                self.jobs.put((bb.copy(), self.token, self.stop, self.game_id))
+        return True
+
+    def _run(self):
+        while True:
+            bitboard, token, stop, game_id = self.jobs.get()
+            if stop.is_set():
+                continue
+            engine = self.engine
+            if bitboard.rules != engine.rules:
+                engine = self.engine = Connect4Game(rules=bitboard.rules)
+            if game_id != self._engine_game_id:
+                engine.reset()
+                self._engine_game_id = game_id
+            engine.bitboard = bitboard
+            engine._new_search()
+            engine._stop = stop
+            start = time.perf_counter()
+            for depth in range(1, bitboard.rules.cells - bitboard.ply + 1):
+                try:
+                    scores = engine.score_columns(depth)
+                except SearchTimeout:
+                    break  # the position moved on; this copy is dropped
+                stats = SearchStats()
+                stats.source = "analysis"
+                stats.move = max(scores, key=scores.get)
+                stats.score = scores[stats.move]
+                stats.depth = depth
+                stats.nodes = engine.nodes
+                stats.elapsed = time.perf_counter() - start
+                stats.column_scores = {col: scores[col] for col in sorted(scores)}
+                pygame.event.post(pygame.event.Event(ANALYSIS_EVENT, token=token, stats=stats))
+                if all(abs(score) >= WIN_SCORE for score in scores.values()):
+                    break  # every column is decided
+            engine._stop = None
+
+
+def render_text(text_font, text, color):
+    # Rendered text surfaces are reused; the status line and score labels
+    # repeat from frame to frame
+    key = (id(text_font), text, color)
+    surface = text_cache.get(key)
+    if surface is None:
+        if len(text_cache) >= TEXT_CACHE_SIZE:
+            text_cache.clear()
+        surface = text_cache[key] = text_font.render(text, True, color)
+    return surface
+
+def status_text(game):
     if game.game_over:
         if game.winner == 1:
-            text = large_font.render("Red wins!", True, RED)
+            return large_font, "Red wins!", RED
         elif game.winner == 2:
-            text = large_font.render("Yellow wins!", True, YELLOW)
+            return large_font, "Yellow wins!", YELLOW
         else:
-            text = large_font.render("It's a draw!", True, WHITE)
+            return large_font, "It's a draw!", WHITE
+    if game.mode == "online" and ((game.is_host and game.turn == 1) or (not game.is_host and game.turn == 0)):
+        return font, "Waiting for opponent...", WHITE
+    if game.turn == 0:
+        return font, "Red's turn", RED
+    if game.mode in ("1v1", "spectate"):
+        return font, "Yellow's turn", YELLOW
+    return font, "AI's turn", YELLOW
+
+def cell_rect(row, col):
+    return pygame.Rect(col*SQUARESIZE, height - (row+1)*SQUARESIZE, SQUARESIZE, SQUARESIZE)
+
+class BoardRenderer:
+    # Draws the game screen incrementally. The empty grid is rendered once;
+    # each frame only cells whose piece changed and the top strip (hover
+    # piece, status, overlay) are redrawn, and only those rectangles are
+    # pushed to the display.
+    def __init__(self):
+        self.grid = None
+        self.board = None  # board as last drawn, None forces a full redraw
+        self.strip_state = None
+        self.draw_times = deque(maxlen=FRAME_SAMPLES)  # seconds spent in draw()
+        self.frame_stamps = deque(maxlen=FRAME_SAMPLES)
+
+    def invalidate(self):
+        # Call after anything else has drawn on the screen
+        self.board = None
+
+    def _build_grid(self):
+        self.grid = pygame.Surface((width, ROW_COUNT*SQUARESIZE)).convert()
+        for c in range(COLUMN_COUNT):
+            for r in range(ROW_COUNT):
+                pygame.draw.rect(self.grid, LIGHT_BLUE, (c*SQUARESIZE, r*SQUARESIZE, SQUARESIZE, SQUARESIZE))
+                pygame.draw.circle(self.grid, WHITE, (int(c*SQUARESIZE+SQUARESIZE/2), int(r*SQUARESIZE+SQUARESIZE/2)), RADIUS)
+
+    def draw(self, screen, game, mouse_x=None):
+        start = time.perf_counter()
+        if self.grid is None:
+            self._build_grid()
+        board = game.board
+        dirty = []
+
+        if self.board is None:
+            screen.blit(self.grid, (0, SQUARESIZE))
+            for r, c in zip(*np.nonzero(board)):
+                self._draw_piece(screen, r, c, board[r][c])
+            self.strip_state = None
+            dirty.append(screen.get_rect())
+        else:
+            for r, c in zip(*np.nonzero(board != self.board)):
+                rect = cell_rect(r, c)
+                screen.blit(self.grid, rect, rect.move(0, -SQUARESIZE))
+                if board[r][c]:
+                    self._draw_piece(screen, r, c, board[r][c])
+                dirty.append(rect)
+        self.board = board
+
+        if mouse_x is None:
+            mouse_x = pygame.mouse.get_pos()[0]
+        hover = game.mode != "spectate" and (game.turn == 0 or game.mode == "1v1")
+        overlay = (game.last_search, int(start)) if game.show_analysis else None
+        hints = game.hints if game.show_hints else None
+        strip_state = (mouse_x if hover else None, status_text(game), overlay, hints)
+        if strip_state != self.strip_state:
+            self._draw_strip(screen, game, strip_state[0])
+            self.strip_state = strip_state
+            dirty.append(pygame.Rect(0, 0, width, SQUARESIZE))
+
+        if dirty:
+            pygame.display.update(dirty)
+        self.draw_times.append(time.perf_counter() - start)
+        self.frame_stamps.append(start)
+
+    def _draw_piece(self, screen, r, c, piece):
+        color = RED if piece == 1 else YELLOW
+        pygame.draw.circle(screen, color, (int(c*SQUARESIZE+SQUARESIZE/2), height-int(r*SQUARESIZE+SQUARESIZE/2)), RADIUS)
+
+    def _draw_strip(self, screen, game, hover_x):
+        screen.fill(BLUE, (0, 0, width, SQUARESIZE))
+        if hover_x is not None:
+            color = RED if game.turn == 0 else YELLOW
+            pygame.draw.circle(screen, color, (hover_x, int(SQUARESIZE/2)), RADIUS)
+        text = render_text(*status_text(game))
         screen.blit(text, (width//2 - text.get_width()//2, 10))
-    else:
-        if game.mode == "online" and ((game.is_host and game.turn == 1) or (not game.is_host and game.turn == 0)):
-            text = font.render("Waiting for opponent...", True, WHITE)
-            screen.blit(text, (width//2 - text.get_width()//2, 10))
+        if game.show_analysis:
+            draw_analysis(screen, game)
+        if game.show_hints and game.hints is not None:
+            draw_search(screen, game.hints)
+
+    def frame_stats(self):
+        # (average draw time in ms, frames per second) over recent frames
+        if len(self.frame_stamps) < 2:
+            return 0.0, 0.0
+        draw_ms = sum(self.draw_times) / len(self.draw_times) * 1000
+        fps = (len(self.frame_stamps) - 1) / (self.frame_stamps[-1] - self.frame_stamps[0])
+        return draw_ms, fps
+
+board_renderer = BoardRenderer()
+
+def draw_board(screen, game):
+    board_renderer.draw(screen, game)
+
+def draw_analysis(screen, game):
+    # Per-column scores of the AI's last search, its speed and frame timing
+    draw_ms, fps = board_renderer.frame_stats()
+    text = render_text(small_font, f"draw {draw_ms:.2f} ms  {fps:.0f} fps", BLACK)
+    screen.blit(text, (width - text.get_width() - 5, 45))
+    connection = game.connection
+    if connection is not None and connection.srtt is not None:
+        move_rtt = f"  move {connection.move_rtts[-1] * 1000:.1f} ms" if connection.move_rtts else ""
+        shown = f"  shown {game.display_latencies[-1] * 1000:.1f} ms" if game.display_latencies else ""
+        text = render_text(small_font, f"rtt {connection.srtt * 1000:.1f} ms{move_rtt}{shown}", BLACK)
+        screen.blit(text, (width - text.get_width() - 5, 65))
+    if game.last_search.source is not None:
+        draw_search(screen, game.last_search)
+
+def draw_search(screen, stats):
+    # Per-column scores above the board, the chosen column in green, and a
+    # summary of the search that produced them. A column that failed low
+    # against the best move only has an upper bound, shown as "≤N".
+    for col, score in stats.column_scores.items():
+        if stats.source == "mcts":
+            label = f"{score}%"
+        elif score >= WIN_SCORE:
+            label = "win"
+        elif score <= -WIN_SCORE:
+            label = "loss"
         else:
-            if game.turn == 0:
-                text = font.render("Red's turn", True, RED)
-            else:
-                if game.mode == "1v1":
-                    text = font.render("Yellow's turn", True, YELLOW)
-                else:
-                    text = font.render("AI's turn", True, YELLOW)
-            screen.blit(text, (width//2 - text.get_width()//2, 10))
-    
-    pygame.display.update()
+            label = str(score)
+        if col in stats.bounds and score > -WIN_SCORE:
+            label = "≤" + label
+        color = GREEN if col == stats.move else BLACK
+        text = render_text(small_font, label, color)
+        screen.blit(text, (int(col*SQUARESIZE+SQUARESIZE/2) - text.get_width()//2, SQUARESIZE - text.get_height() - 2))
+    summary = f"{stats.source} d{stats.depth}  {stats.nodes} nodes  {stats.nps / 1000:.0f}k n/s  {stats.elapsed * 1000:.0f} ms"
+    if stats.playouts:
+        summary += f"  {stats.playouts_per_sec / 1000:.0f}k playouts/s"
+    text = render_text(small_font, summary, BLACK)
+    screen.blit(text, (5, 45))
 
 def show_menu(screen):
     screen.fill(BLUE)
@@ -329,6 +559,10 @@ def show_menu(screen):
     difficulty_text = font.render(f"AI Difficulty: {game.ai_difficulty}", True, BLACK)
     screen.blit(difficulty_text, (width//2 - difficulty_text.get_width()//2, 410))
     
+    pygame.draw.rect(screen, GRAY, (width//2 - 150, 460, 300, 40))
+    budget_text = font.render(f"AI Time: {game.ai_time_budget_ms} ms", True, BLACK)
+    screen.blit(budget_text, (width//2 - budget_text.get_width()//2, 470))
+    
     pygame.display.update()
     
     while True:
@@ -364,12 +598,22 @@ def show_menu(screen):
                             game.ai_difficulty = "medium"
                         elif game.ai_difficulty == "medium":
                             game.ai_difficulty = "hard"
+                        elif game.ai_difficulty == "hard":
+                            game.ai_difficulty = "mcts"
                         else:
                             game.ai_difficulty = "easy"
                         
                         
                         show_menu(screen)
                         return
+                
+                elif 460 <= pos[1] <= 500:
+                    if width//2 - 150 <= pos[0] <= width//2 + 150:
+                        index = AI_TIME_BUDGETS.index(game.ai_time_budget_ms) if game.ai_time_budget_ms in AI_TIME_BUDGETS else -1
+                        game.ai_time_budget_ms = AI_TIME_BUDGETS[(index + 1) % len(AI_TIME_BUDGETS)]
+                        
+                        show_menu(screen)
+                        return
 
 def show_online_menu(screen):
     screen.fill(BLUE)
@@ -388,9 +632,19 @@ def show_online_menu(screen):
     screen.blit(join_text, (width//2 - join_text.get_width()//2, 245))
     
     
-    pygame.draw.rect(screen, RED, (width//2 - 150, 310, 300, 60))
+    pygame.draw.rect(screen, GREEN, (width//2 - 150, 310, 300, 60))
+    match_text = font.render("Find Match", True, BLACK)
+    screen.blit(match_text, (width//2 - match_text.get_width()//2, 325))
+    
+    
+    pygame.draw.rect(screen, GREEN, (width//2 - 150, 390, 300, 60))
+    watch_text = font.render("Watch Game", True, BLACK)
+    screen.blit(watch_text, (width//2 - watch_text.get_width()//2, 405))
+    
+    
+    pygame.draw.rect(screen, RED, (width//2 - 150, 470, 300, 60))
     back_text = font.render("Back", True, BLACK)
-    screen.blit(back_text, (width//2 - back_text.get_width()//2, 325))
+    screen.blit(back_text, (width//2 - back_text.get_width()//2, 485))
     
     pygame.display.update()
     
@@ -414,14 +668,25 @@ def show_online_menu(screen):
                         show_join_menu(screen)
                         return
                 
-                elif 310 <= pos[1] <= 370:  # Back
+                elif 310 <= pos[1] <= 370:  # Find match on a match server
+                    if width//2 - 150 <= pos[0] <= width//2 + 150:
+                        show_join_menu(screen, role="match")
+                        return
+                
+                elif 390 <= pos[1] <= 450:  # Watch a hosted game
+                    if width//2 - 150 <= pos[0] <= width//2 + 150:
+                        show_join_menu(screen, role="watch")
+                        return
+                
+                elif 470 <= pos[1] <= 530:  # Back
                     show_menu(screen)
                     return
 
-def show_join_menu(screen):
+def show_join_menu(screen, role="join"):
+    # role: "join" a hosted game, find a "match" on server.py, or "watch" a hosted game
     screen.fill(BLUE)
     
-    title = large_font.render("Join Game", True, WHITE)
+    title = large_font.render({"join": "Join Game", "match": "Find Match", "watch": "Watch Game"}[role], True, WHITE)
     screen.blit(title, (width//2 - title.get_width()//2, 50))
     
    
@@ -429,7 +694,7 @@ def show_join_menu(screen):
     pygame.draw.rect(screen, WHITE, input_rect, 2)
     
     font_small = pygame.font.SysFont("Arial", 24)
-    ip_text = font_small.render("Enter host IP:", True, WHITE)
+    ip_text = font_small.render("Enter server IP:" if role == "match" else "Enter host IP:", True, WHITE)
     screen.blit(ip_text, (width//2 - ip_text.get_width()//2, 120))
     
     
@@ -464,16 +729,21 @@ def show_join_menu(screen):
                 if 220 <= pos[1] <= 280:  # Join
                     if width//2 - 150 <= pos[0] <= width//2 + 150:
                         if ip_address:
-                            game.mode = "online"
+                            game.mode = "spectate" if role == "watch" else "online"
                             try:
-                                game.connect_to_server(ip_address)
+                                if role == "match":
+                                    game.connect_to_match_server(ip_address)
+                                elif role == "watch":
+                                    game.spectate(ip_address)
+                                else:
+                                    game.connect_to_server(ip_address)
                                 return
                             except:
                                 error_text = font.render("Connection failed!", True, RED)
                                 screen.blit(error_text, (width//2 - error_text.get_width()//2, 380))
                                 pygame.display.update()
                                 pygame.time.delay(2000)
-                                show_join_menu(screen)
+                                show_join_menu(screen, role)
                                 return
                 
                 elif 300 <= pos[1] <= 360:  # Back
@@ -506,72 +776,167 @@ def show_game_over(screen):
             if event.type == pygame.MOUSEBUTTONDOWN:
                 return  # Return to main menu
 
+game_log = None  # GameLogWriter, opened when the first game is recorded
+telemetry = None  # telemetry.Telemetry when CONNECT4_TELEMETRY is set, see telemetry.py
+
+def record_game(game):
+    global game_log
+    if not game.bitboard.ply:
+        return
+    try:
+        if game_log is None:
+            game_log = GameLogWriter()
+        game_log.append(GameRecord.from_game(game))
+    except (OSError, ValueError) as e:
+        log.warning("game not recorded: %s", e)
+
+def init_display():
+    # Importing this module stays cheap: pygame and its system font scan are
+    # only started when the GUI is
+    global font, large_font, small_font
+    pygame.init()
+    font = pygame.font.SysFont("Arial", 30)
+    large_font = pygame.font.SysFont("Arial", 50)
+    small_font = pygame.font.SysFont("Arial", 18)
+
 def main():
-    global game, screen
+    global game, screen, telemetry
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    telemetry = telemetry_from_environment()
+    if telemetry is not None:
+        atexit.register(telemetry.close)
+    init_display()
     screen = pygame.display.set_mode(size)
     pygame.display.set_caption("Connect 4")
     
-    game = Connect4Game()
+    game = GameSession()
+    ai_worker = AIWorker()
+    analyzer = Analyzer()
     
     while True:
-        show_menu(screen)
         game.reset()
+        show_menu(screen)
+        ai_worker.new_game()
+        analyzer.new_game()
+        game.start_clock()
         
         # Main game loop
         running = True
+        recorded = False
         clock = pygame.time.Clock()
+        board_renderer.invalidate()
+        last_input = time.perf_counter()
+        received = []  # receipt times of network moves not drawn yet
+        clicked = []  # times clicks that played a piece were handled, not drawn yet
+        ai_moves = []  # request times of AI moves not drawn yet
         
         while running:
-            for event in pygame.event.get():
+            # When idle, sleep until an event arrives instead of polling at
+            # full frame rate
+            idle = time.perf_counter() - last_input > IDLE_AFTER_MS / 1000
+            events = pygame.event.get()
+            if idle and not events:
+                event = pygame.event.wait(IDLE_FRAME_MS)
+                if event.type != pygame.NOEVENT:
+                    events.append(event)
+            frame_start = time.perf_counter()
+            if events:
+                last_input = frame_start
+            
+            for event in events:
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
                 
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    board_renderer.invalidate()
+                
                 if event.type == pygame.MOUSEBUTTONDOWN and not game.game_over:
+                    click_time = time.perf_counter()  # not frame_start: earlier events may have run since
                     if game.mode == "online":
                         if (game.is_host and game.turn == 0) or (not game.is_host and game.turn == 1):
                             posx = event.pos[0]
                             col = int(posx // SQUARESIZE)
                             
-                            if game.is_valid_location(col):
-                                row = game.get_next_open_row(col)
-                                game.drop_piece(row, col, game.turn + 1)
-                                
-                                if game.winning_move(game.turn + 1):
-                                    game.game_over = True
-                                    game.winner = game.turn + 1
-                                elif game.is_board_full():
-                                    game.game_over = True
-                                    game.winner = 0
-                                
+                            if game.make_move(col):
                                 game.send_move(col)
-                                game.turn = (game.turn + 1) % 2
-                    else:
+                                clicked.append(click_time)
+                    elif game.mode != "spectate":
                         if game.turn == 0 or game.mode == "1v1":
                             posx = event.pos[0]
                             col = int(posx // SQUARESIZE)
-                            game.make_move(col)
+                            if game.make_move(col):
+                                clicked.append(click_time)
+                                if game.mode == "1vAI":
+                                    ai_worker.on_human_move(game, col)
+                
+                if event.type == AI_MOVE_EVENT and event.token == ai_worker.token:
+                    if not game.game_over and game.mode == "1vAI" and game.turn == 1:
+                        game.last_search = event.stats
+                        game.make_move(event.col)
+                        ai_worker.ponder(game)
+                        ai_moves.append(event.started)
+                        if telemetry is not None:
+                            telemetry.record("ai_think_ms", event.think)
+                
+                if event.type == ANALYSIS_EVENT and event.token == analyzer.token:
+                    game.hints = event.stats
+                
+                if event.type == NET_MOVE_EVENT and event.token == game.net_token:
+                    if game.mode in ("online", "spectate") and game.make_move(event.col):
+                        received.append(event.received)
                 
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
+                        ai_worker.cancel()
+                        analyzer.cancel()
                         running = False
+                    if event.key == pygame.K_p and telemetry is not None:
+                        telemetry.toggle_profiler()
+                    if event.key == pygame.K_a:
+                        game.show_analysis = not game.show_analysis
+                    if event.key == pygame.K_h and game.mode in ("1v1", "online", "spectate"):
+                        game.show_hints = not game.show_hints
+                        if not game.show_hints:
+                            analyzer.cancel()
+                            game.hints = None
                     if event.key == pygame.K_r and game.game_over:
-                        game.reset()
-            
-           
-            if not game.game_over and game.mode == "1vAI" and game.turn == 1:
-                pygame.time.delay(500)  # Small delay for better UX
-                game.ai_move()
+                        if game.mode in ("online", "spectate"):
+                            # A rematch needs a new connection
+                            running = False
+                        else:
+                            game.reset()
+                            ai_worker.new_game()
+                            analyzer.new_game()
+                            recorded = False
             
+            if game.game_over and not recorded:
+                record_game(game)
+                recorded = True
             
-            if not game.game_over and game.mode == "online" and game.opponent_move is not None:
-                col = game.opponent_move
-                game.opponent_move = None
-                game.make_move(col)
+            if game.show_hints and analyzer.follow(game):
+                game.hints = None  # scores of the previous position
             
+            draw_start = time.perf_counter()
             draw_board(screen, game)
-            clock.tick(60)
+            shown = time.perf_counter()
+            for t in received:
+                game.display_latencies.append(shown - t)
+                log.debug("network move shown %.2f ms after receipt", (shown - t) * 1000)
+            if telemetry is not None:
+                telemetry.record_frame(frame_start, draw_start, shown)
+                telemetry.record_since("click_to_render_ms", clicked, shown)
+                telemetry.record_since("net_to_display_ms", received, shown)
+                telemetry.record_since("ai_to_render_ms", ai_moves, shown)
+                telemetry.tick(shown)
+            received.clear()
+            clicked.clear()
+            ai_moves.clear()
+            if not idle:
+                clock.tick(ACTIVE_FPS)
         
+        if not recorded:
+            record_game(game)  # left before the end
         
         draw_board(screen, game)
         show_game_over(screen)
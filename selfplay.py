@@ -0,0 +1,153 @@
+"""Headless AI-vs-AI matches for checking strength and speed.
+
+Plays --games games between two AI levels on a process pool, alternating
+who moves first, and prints each result as it finishes. --record appends
+the games to a game log. hard and mcts get the same time per move, so
+they can be compared at equal wall-clock time:
+
+    python selfplay.py hard medium --games 200 --budget-ms 100
+    python selfplay.py hard mcts --games 50 --budget-ms 500
+
+--search-workers gives every hard search its own pool for the parallel
+root search, so pair it with a smaller --workers.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from engine import AI_LEVELS, AI_TIME_BUDGET_MS, AI_WORKERS, Connect4Game
+from engine.gamelog import GameLogWriter, GameRecord
+
+
+_engines = {}
+
+
+def choose_move(engine, bitboard, player):
+    # The AIs play piece 2; for piece 1 they get the board with colors
+    # swapped, which is the same position for them.
+    board = bitboard.copy()
+    if player == 0:
+        board.masks.reverse()
+        board.moves = [(col, 1 - p) for col, p in board.moves]
+    engine.bitboard = board
+    engine.turn = 1
+    engine.game_over = False
+    return engine.ai_move()
+
+
+def play_game(index, levels, budget_ms, seed, search_workers=1):
+    # levels[0] moves first. Returns the winning side (0, 1 or None for a
+    # draw), the moves, each side's per-move think times in seconds, each
+    # side's summed (nodes, playouts, seconds) of its searches and the
+    # game's GameRecord.
+    random.seed(seed)
+    engines = []
+    for side, level in enumerate(levels):
+        engine = _engines.get(side)
+        if engine is None:
+            engine = _engines[side] = Connect4Game()
+        engine.reset()
+        engine.ai_difficulty = level
+        engine.ai_time_budget_ms = budget_ms
+        engine.ai_workers = search_workers
+        engines.append(engine)
+
+    game = Connect4Game()
+    times = ([], [])
+    searched = [[0, 0, 0.0], [0, 0, 0.0]]
+    while not game.game_over:
+        side = game.turn
+        last_search = engines[side].last_search
+        start = time.perf_counter()
+        col = choose_move(engines[side], game.bitboard, side)
+        times[side].append(time.perf_counter() - start)
+        stats = engines[side].last_search
+        if stats is not last_search and stats.source in ("search", "mcts"):
+            searched[side][0] += stats.nodes
+            searched[side][1] += stats.playouts
+            searched[side][2] += stats.elapsed
+        game.make_move(col)
+    for engine in engines:
+        # Search pool processes are children of this worker, which waits for
+        # them when it exits, so they don't outlive the game
+        engine.shutdown_pool()
+    winner = game.winner - 1 if game.winner else None
+    record = GameRecord("selfplay", levels, game.winner, [col for col, _ in game.bitboard.moves], game.started,
+                        [sum(t) * 1000 for t in times])
+    return index, winner, record.moves, times, searched, record
+
+
+def percentiles(values):
+    if not values:
+        return "n/a"
+    p50, p90, p99 = np.percentile(values, [50, 90, 99]) * 1000
+    return f"p50 {p50:.1f}ms  p90 {p90:.1f}ms  p99 {p99:.1f}ms  max {max(values) * 1000:.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("a", choices=AI_LEVELS)
+    parser.add_argument("b", choices=AI_LEVELS)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--budget-ms", type=int, default=AI_TIME_BUDGET_MS, help="hard and mcts time per move")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="games played at once")
+    parser.add_argument("--search-workers", type=int, default=AI_WORKERS,
+                        help="processes per hard AI search; above 1 searches root moves in parallel")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jsonl", action="store_true", help="print one JSON object per game")
+    parser.add_argument("--record", metavar="PATH", help="append every game to this game log")
+    args = parser.parse_args()
+    game_log = GameLogWriter(args.record) if args.record else None
+
+    results = {"a": 0, "b": 0, "draw": 0}
+    move_times = {"a": [], "b": []}
+    searched = {"a": [0, 0, 0.0], "b": [0, 0, 0.0]}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = []
+        for index in range(args.games):
+            # a moves first in even games, b in odd ones
+            levels = (args.a, args.b) if index % 2 == 0 else (args.b, args.a)
+            futures.append(pool.submit(play_game, index, levels, args.budget_ms, args.seed + index,
+                                       args.search_workers))
+
+        for done, future in enumerate(as_completed(futures), 1):
+            index, winner, moves, times, game_searched, record = future.result()
+            if game_log is not None:
+                game_log.append(record)
+            names = ("a", "b") if index % 2 == 0 else ("b", "a")
+            result = "draw" if winner is None else names[winner]
+            results[result] += 1
+            for side, name in enumerate(names):
+                move_times[name].extend(times[side])
+                searched[name] = [total + part for total, part in zip(searched[name], game_searched[side])]
+            if args.jsonl:
+                print(json.dumps({"game": index, "first": names[0], "result": result, "moves": moves}), flush=True)
+            else:
+                print(f"[{done}/{args.games}] game {index}: {result} in {len(moves)} moves "
+                      f"({'a' if index % 2 == 0 else 'b'} first)", flush=True)
+
+    elapsed = time.perf_counter() - start
+    out = sys.stderr if args.jsonl else sys.stdout
+    print(f"\n{args.a} (a) vs {args.b} (b), {args.games} games in {elapsed:.1f}s "
+          f"({args.games / elapsed:.2f} games/s)", file=out)
+    print(f"  a wins {results['a'] / args.games:6.1%}   draws {results['draw'] / args.games:6.1%}"
+          f"   b wins {results['b'] / args.games:6.1%}", file=out)
+    for name, level in (("a", args.a), ("b", args.b)):
+        print(f"  {name} ({level}) move time: {percentiles(move_times[name])}", file=out)
+        nodes, playouts, seconds = searched[name]
+        if seconds:
+            rate = f"{nodes / seconds:,.0f} nodes/s"
+            if playouts:
+                rate += f", {playouts / seconds:,.0f} playouts/s"
+            print(f"  {name} ({level}) search: {rate}", file=out)
+
+
+if __name__ == "__main__":
+    main()
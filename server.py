@@ -0,0 +1,213 @@
+"""Headless match server for online play.
+
+Pairs clients from a matchmaking queue and hosts every game on one asyncio
+event loop. The server keeps the authoritative position of each match and
+applies moves with Connect4Game.make_move, so an illegal or out-of-turn
+move is rejected instead of being relayed. Clients speak protocol.py:
+
+    python server.py --port 5556
+
+and the game connects to it with "Find Match" in the online menu.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import socket
+import struct
+import time
+from collections import deque
+
+from protocol import (
+    HEADER, MSG_ACK, MSG_BYE, MSG_HELLO, MSG_JOIN, MSG_MOVE, MSG_PING, MSG_PONG,
+    MATCH_SERVER_PORT, MSG_REJECT, MSG_START, PROTOCOL_VERSION, START_PAYLOAD, ProtocolError, encode_frame,
+)
+from engine import Connect4Game
+
+
+STATS_SECONDS = 10.0  # how often the server logs its load
+MATCH_TT_SIZE = 1  # matches only check rules, they never search
+LISTEN_BACKLOG = 1024  # clients connecting at once during a load spike
+
+log = logging.getLogger("connect4")
+
+
+class Session:
+    # One connected client
+    __slots__ = ("id", "reader", "writer", "send_seq", "recv_seq", "match", "side", "queued")
+
+    def __init__(self, session_id, reader, writer):
+        self.id = session_id
+        self.reader = reader
+        self.writer = writer
+        self.send_seq = 0
+        self.recv_seq = 0
+        self.match = None
+        self.side = None
+        self.queued = False
+
+    def send(self, msg_type, payload=b""):
+        # Buffered by the transport; a slow client never blocks the loop
+        if self.writer.is_closing():
+            return
+        self.writer.write(encode_frame(msg_type, self.send_seq, payload))
+        self.send_seq += 1
+
+    async def read_frame(self):
+        length, msg_type, seq = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+        payload = await self.reader.readexactly(length) if length else b""
+        if seq != self.recv_seq:
+            log.warning("session %d: expected frame %d, got %d", self.id, self.recv_seq, seq)
+        self.recv_seq = seq + 1
+        return msg_type, seq, payload
+
+
+class Match:
+    __slots__ = ("id", "players", "game")
+
+    def __init__(self, match_id, first, second):
+        self.id = match_id
+        self.players = (first, second)
+        self.game = Connect4Game(tt_size=MATCH_TT_SIZE)
+
+
+class MatchServer:
+    def __init__(self):
+        self.sessions = {}  # session id -> Session
+        self.matches = {}  # match id -> Match
+        self.waiting = deque()  # sessions queued for a match, oldest first
+        self._session_ids = itertools.count()
+        self._match_ids = itertools.count()
+        self.moves = 0
+        self.rejected = 0
+        self.games_finished = 0
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, backlog=LISTEN_BACKLOG, reuse_address=True)
+        log.info("match server listening on %s:%d", host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self._report())
+
+    async def handle(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        session = Session(next(self._session_ids), reader, writer)
+        self.sessions[session.id] = session
+        session.send(MSG_HELLO, bytes([PROTOCOL_VERSION]))
+        try:
+            while True:
+                msg_type, seq, payload = await session.read_frame()
+                if msg_type == MSG_BYE:
+                    break
+                self.dispatch(session, msg_type, seq, payload)
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError) as e:
+            if not isinstance(e, asyncio.IncompleteReadError):
+                log.warning("session %d dropped: %s", session.id, e)
+        finally:
+            self.disconnect(session)
+            writer.close()
+
+    def dispatch(self, session, msg_type, seq, payload):
+        if msg_type == MSG_MOVE:
+            if len(payload) != 1:
+                raise ProtocolError("bad MOVE payload")
+            self.play(session, seq, payload[0])
+        elif msg_type == MSG_JOIN:
+            self.join(session)
+        elif msg_type == MSG_PING:
+            session.send(MSG_PONG, payload)
+        elif msg_type == MSG_HELLO:
+            if payload[:1] != bytes([PROTOCOL_VERSION]):
+                raise ProtocolError(f"client speaks protocol version {payload[0] if payload else None}")
+        elif msg_type in (MSG_ACK, MSG_PONG):
+            pass
+        else:
+            raise ProtocolError(f"unexpected message type {msg_type}")
+
+    def join(self, session):
+        if session.match is not None or session.queued:
+            return
+        if self.waiting:
+            opponent = self.waiting.popleft()
+            opponent.queued = False
+            self.start_match(opponent, session)
+        else:
+            session.queued = True
+            self.waiting.append(session)
+
+    def start_match(self, first, second):
+        match = Match(next(self._match_ids), first, second)
+        self.matches[match.id] = match
+        for side, player in enumerate(match.players):
+            player.match = match
+            player.side = side
+            player.send(MSG_START, START_PAYLOAD.pack(side, match.id))
+
+    def play(self, session, seq, col):
+        match = session.match
+        if match is None or match.game.turn != session.side or not match.game.make_move(col):
+            self.rejected += 1
+            session.send(MSG_REJECT, struct.pack("<I", seq))
+            return
+        self.moves += 1
+        session.send(MSG_ACK, struct.pack("<I", seq))
+        match.players[1 - session.side].send(MSG_MOVE, bytes([col]))
+        if match.game.game_over:
+            self.games_finished += 1
+            self.end_match(match)
+
+    def end_match(self, match):
+        # Both players stay connected and may JOIN again
+        del self.matches[match.id]
+        for player in match.players:
+            player.match = None
+            player.side = None
+
+    def disconnect(self, session):
+        self.sessions.pop(session.id, None)
+        if session.queued:
+            self.waiting.remove(session)
+        match = session.match
+        if match is not None:
+            # A match cannot go on without both players
+            opponent = match.players[1 - session.side]
+            self.end_match(match)
+            opponent.send(MSG_BYE)
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "matches": len(self.matches),
+            "waiting": len(self.waiting),
+            "moves": self.moves,
+            "rejected": self.rejected,
+            "games_finished": self.games_finished,
+        }
+
+    async def _report(self):
+        last_moves, last_time = 0, time.perf_counter()
+        while True:
+            await asyncio.sleep(STATS_SECONDS)
+            now = time.perf_counter()
+            stats = self.stats()
+            stats["moves_per_s"] = round((self.moves - last_moves) / (now - last_time), 1)
+            last_moves, last_time = self.moves, now
+            log.info("server %s", stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=MATCH_SERVER_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        asyncio.run(MatchServer().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Opt-in timing telemetry for the game loop.
+
+Set CONNECT4_TELEMETRY to a file path to turn it on:
+
+    CONNECT4_TELEMETRY=telemetry.jsonl python script.py
+
+Every SUMMARY_SECONDS a JSON line is appended to that file. It holds, for
+each metric timed in that interval, the sample count, mean, p50, p95, p99
+and max in milliseconds and the non-empty histogram buckets:
+
+    frame_ms             work per frame: event handling plus draw_board
+    events_ms            event handling and game updates before drawing
+    draw_ms              draw_board
+    click_to_render_ms   mouse click handled to the piece on screen (display.update)
+    net_to_display_ms    online move received to drawn
+    ai_think_ms          AI job submitted to move chosen, on the worker thread
+    ai_to_render_ms      AI job submitted to move drawn, with AI_MOVE_DELAY_MS
+
+With telemetry on, P starts and stops cProfile on the game loop thread and
+each profile is written next to the telemetry file, for
+`python -m pstats` or any .prof viewer. Off, nothing is created and the
+game loop only tests one global for None per frame.
+"""
+import bisect
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+
+
+TELEMETRY_ENV = "CONNECT4_TELEMETRY"
+SUMMARY_SECONDS = 10.0
+# Histogram buckets: upper edges growing 20 per decade from 0.01 ms to
+# 100 s, so a percentile is read to within 12% of the exact value
+BUCKETS_PER_DECADE = 20
+BUCKET_EDGES = [round(0.01 * 10 ** (i / BUCKETS_PER_DECADE), 4) for i in range(7 * BUCKETS_PER_DECADE + 1)]
+PROFILE_TOP = 25  # functions logged when a profile stops
+
+log = logging.getLogger("connect4")
+
+
+class Histogram:
+    # Counts of samples in log-spaced buckets: fixed memory and a binary
+    # search per sample however long the game runs. Percentiles are the
+    # upper edge of the bucket they fall in, capped at the largest sample.
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKET_EDGES, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q):
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return round(min(BUCKET_EDGES[i], self.max) if i < len(BUCKET_EDGES) else self.max, 3)
+        return 0.0
+
+    def buckets(self):
+        # Upper bucket edge in ms -> samples, for the non-empty buckets
+        return {str(BUCKET_EDGES[i] if i < len(BUCKET_EDGES) else "inf"): count
+                for i, count in enumerate(self.counts) if count}
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": round(self.max, 3),
+            "histogram": self.buckets(),
+        }
+
+
+class Telemetry:
+    # Collects samples on the game loop thread and appends one summary per
+    # interval to `path`; histograms start over after every summary
+    def __init__(self, path, interval=SUMMARY_SECONDS):
+        self.path = path
+        self.interval = interval
+        self.histograms = {}
+        self.interval_started = time.perf_counter()
+        self.profiler = None
+        self.file = open(path, "a")
+
+    def record(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(seconds * 1000)
+
+    def record_frame(self, start, draw_start, end):
+        # perf_counter() times of one frame: its events are handled from
+        # start to draw_start, then the board is drawn until end
+        self.record("events_ms", draw_start - start)
+        self.record("draw_ms", end - draw_start)
+        self.record("frame_ms", end - start)
+
+    def record_since(self, name, starts, now):
+        for start in starts:
+            self.record(name, now - start)
+
+    def tick(self, now):
+        # Call once per frame with time.perf_counter(); writes the summary
+        # when the interval is up
+        if now - self.interval_started >= self.interval:
+            self.flush(now)
+
+    def flush(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.histograms:
+            summary = {
+                "time": round(time.time(), 3),
+                "interval_s": round(now - self.interval_started, 3),
+                "metrics": {name: self.histograms[name].summary() for name in sorted(self.histograms)},
+            }
+            self.file.write(json.dumps(summary) + "\n")
+            self.file.flush()
+        self.histograms = {}
+        self.interval_started = now
+
+    def toggle_profiler(self):
+        # Starts profiling, or stops it and returns the .prof file written
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            log.info("profiling started")
+            return None
+        self.profiler.disable()
+        path = f"{os.path.splitext(self.path)[0]}-{time.strftime('%Y%m%d-%H%M%S')}.prof"
+        self.profiler.dump_stats(path)
+        if log.isEnabledFor(logging.INFO):
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            log.info("profile written to %s\n%s", path, out.getvalue())
+        self.profiler = None
+        return path
+
+    def close(self):
+        if self.profiler is not None:
+            self.toggle_profiler()
+        self.flush()
+        self.file.close()
+
+
+def from_environment():
+    # A Telemetry writing to $CONNECT4_TELEMETRY, or None when it is unset
+    path = os.environ.get(TELEMETRY_ENV)
+    return Telemetry(path) if path else None
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules under test live at the repository root, which plain `pytest`
+# does not put on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,39 @@
+import random
+
+import numpy as np
+import pytest
+
+from engine import COLUMN_COUNT, ROW_COUNT, Bitboard, Connect4Game
+from engine.batch import analyze_boards
+
+
+def random_boards(count, seed=0):
+    # Positions from random games stopped at a random ply, some of them won or full
+    rng = random.Random(seed)
+    boards = np.zeros((count, ROW_COUNT, COLUMN_COUNT), dtype=np.int8)
+    for i in range(count):
+        bb = Bitboard()
+        for _ in range(rng.randint(0, ROW_COUNT * COLUMN_COUNT)):
+            bb.play(rng.choice([col for col in range(COLUMN_COUNT) if bb.can_play(col)]), bb.ply % 2)
+            if bb.last_move_won() or bb.is_full():
+                break
+        boards[i] = bb.to_array()
+    return boards
+
+
+def test_analyze_boards_matches_the_scalar_path():
+    boards = random_boards(3000)
+    winner, draw, score = analyze_boards(boards)
+    game = Connect4Game(tt_size=1)
+    for i, board in enumerate(boards):
+        game.bitboard = Bitboard.from_array(board)
+        expected_winner = game.winning_move(1) + 2 * game.winning_move(2)
+        assert winner[i] == expected_winner, i
+        assert draw[i] == (game.is_board_full() and not expected_winner), i
+        assert score[i] == game.evaluate(), i
+    assert winner.any() and draw.any()  # the sample covers finished games
+
+
+def test_analyze_boards_rejects_other_shapes():
+    with pytest.raises(ValueError):
+        analyze_boards(np.zeros((2, COLUMN_COUNT, ROW_COUNT), dtype=np.int8))
@@ -0,0 +1,66 @@
+import random
+
+from engine import Bitboard, Rules
+
+
+def random_games(count, rules=Rules(), seed=0):
+    # Bitboards after every ply of `count` random games, up to the end of each
+    rng = random.Random(seed)
+    for _ in range(count):
+        bb = Bitboard(rules)
+        while not bb.is_full():
+            bb.play(rng.choice([col for col in range(rules.columns) if bb.can_play(col)]), bb.ply % 2)
+            yield bb
+            if bb.last_move_won():
+                break
+
+
+def test_play_and_undo_restore_the_position():
+    bb = Bitboard()
+    for col in (3, 3, 2, 4):
+        bb.play(col, bb.ply % 2)
+    before = (bb.position(), bb.heights[:], bb.ply)
+    row = bb.play(3, 0)
+    assert row == 2 and bb.cell(2, 3) == 1
+    assert bb.undo() == 3
+    assert (bb.position(), bb.heights, bb.ply) == before
+
+
+def test_full_column_cannot_be_played():
+    bb = Bitboard()
+    for i in range(bb.rules.rows):
+        assert bb.can_play(0)
+        bb.play(0, i % 2)
+    assert not bb.can_play(0)
+
+
+def test_last_move_won_matches_the_full_board_check():
+    for rules in (Rules(), Rules(8, 9, 5)):
+        for bb in random_games(200, rules):
+            player = bb.moves[-1][1]
+            assert bb.last_move_won() == bb.has_won(player)
+
+
+def test_array_and_position_round_trip():
+    for bb in random_games(50):
+        assert Bitboard.from_array(bb.to_array()).position() == bb.position()
+        copy = Bitboard.from_position(bb.position())
+        assert (copy.heights, copy.ply) == (bb.heights, bb.ply)
+
+
+def test_key_is_unique_per_position():
+    seen = {}
+    for bb in random_games(300):
+        seen.setdefault(bb.key(), bb.position())
+        assert seen[bb.key()] == bb.position()
+
+
+def test_mirrored_positions_share_a_canonical_key():
+    bb, mirror = Bitboard(), Bitboard()
+    for col in (3, 1, 0, 5, 2):
+        bb.play(col, bb.ply % 2)
+        mirror.play(bb.rules.columns - 1 - col, mirror.ply % 2)
+    key, mirrored = bb.canonical_key()
+    mirror_key, mirror_mirrored = mirror.canonical_key()
+    assert key == mirror_key
+    assert mirrored != mirror_mirrored
@@ -0,0 +1,76 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from engine import COLUMN_COUNT, ROW_COUNT, Connect4Game
+from engine.gamelog import (GAME_LOG_HEADER, GAME_LOG_MAGIC, GAME_LOG_VERSION, GAME_RECORD, GAME_RECORD_DTYPE, GameLog,
+                            GameLogWriter, GameRecord, pack_moves, unpack_moves)
+
+
+def random_game(rng):
+    game = Connect4Game(tt_size=1)
+    game.mode = "1v1"
+    while not game.game_over:
+        game.make_move(rng.choice([col for col in range(COLUMN_COUNT) if game.is_valid_location(col)]))
+    return game
+
+
+def test_pack_moves_round_trip():
+    rng = np.random.default_rng(0)
+    plies = ROW_COUNT * COLUMN_COUNT
+    moves = rng.integers(0, COLUMN_COUNT, (500, plies)).astype(np.int8)
+    lengths = rng.integers(0, plies + 1, 500)
+    moves[np.arange(plies) >= lengths[:, None]] = -1
+    records = np.zeros(500, dtype=GAME_RECORD_DTYPE)
+    records["plies"] = lengths
+    records["moves"] = pack_moves(moves)
+    assert np.array_equal(unpack_moves(records), moves)
+
+
+def test_pack_moves_matches_record_pack():
+    record = GameRecord("selfplay", ("hard", "medium"), 2, [3, 3, 2, 6, 0, 1], started=1700000000, think_ms=(5, 7))
+    packed = np.frombuffer(record.pack(), dtype=GAME_RECORD_DTYPE)
+    assert np.array_equal(packed["moves"][0], pack_moves([record.moves])[0])
+    assert unpack_moves(packed)[0, :6].tolist() == record.moves
+
+
+def test_log_round_trip_and_replay(tmp_path):
+    rng = random.Random(0)
+    games = [random_game(rng) for _ in range(50)]
+    path = str(tmp_path / "games.c4g")
+    writer = GameLogWriter(path)
+    for game in games:
+        writer.append(GameRecord.from_game(game))
+    writer.close()
+
+    game_log = GameLog(path)
+    assert len(game_log) == len(games)
+    assert game_log.to_numpy()["plies"].tolist() == [game.bitboard.ply for game in games]
+    for i, game in enumerate(games):
+        record = game_log[i]
+        assert record.moves == [col for col, _ in game.bitboard.moves]
+        replayed = record.replay(Connect4Game(tt_size=1))
+        assert replayed.bitboard.masks == game.bitboard.masks
+        assert replayed.winner == game.winner == record.result
+    game_log.close()
+
+
+def test_writer_drops_a_torn_record(tmp_path):
+    path = str(tmp_path / "games.c4g")
+    writer = GameLogWriter(path)
+    writer.append(GameRecord("1v1", ("human", "human"), 1, [3, 2, 3, 2, 3, 2, 3]))
+    writer.file.write(b"\0" * (GAME_RECORD.size // 2))  # a crash in the middle of the next record
+    writer.close()
+    GameLogWriter(path).close()
+    assert os.path.getsize(path) == GAME_LOG_HEADER.size + GAME_RECORD.size
+
+
+def test_log_for_another_board_is_rejected(tmp_path):
+    path = tmp_path / "other.c4g"
+    path.write_bytes(GAME_LOG_HEADER.pack(GAME_LOG_MAGIC, GAME_LOG_VERSION, ROW_COUNT + 1, COLUMN_COUNT))
+    with pytest.raises(ValueError):
+        GameLog(str(path))
+    with pytest.raises(ValueError):
+        GameLogWriter(str(path))
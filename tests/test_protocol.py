@@ -0,0 +1,48 @@
+import socket
+import threading
+
+from protocol import HEADER, MSG_ACK, MSG_HELLO, MSG_MOVE, Connection, FrameDecoder, encode_frame
+
+
+def connected_pair():
+    listener = socket.create_server(("127.0.0.1", 0))
+    peer = socket.create_connection(listener.getsockname())
+    sock, _ = listener.accept()
+    listener.close()
+    peer.settimeout(2.0)
+    return sock, peer
+
+
+def read_frames(peer, count):
+    decoder = FrameDecoder()
+    frames = []
+    while len(frames) < count:
+        data = peer.recv(65536)
+        if not data:
+            break
+        frames += decoder.feed(data)
+    return frames
+
+
+def test_move_is_delivered_and_acknowledged():
+    sock, peer = connected_pair()
+    moves = []
+    received = threading.Event()
+    connection = Connection(sock, on_move=lambda col: (moves.append(col), received.set())).start()
+    peer.sendall(encode_frame(MSG_MOVE, 0, bytes([3])))
+    assert received.wait(2.0)
+    assert moves == [3]
+    assert [frame[0] for frame in read_frames(peer, 2)] == [MSG_HELLO, MSG_ACK]
+    connection.close()
+    peer.close()
+
+
+def test_move_outside_the_board_closes_the_connection():
+    sock, peer = connected_pair()
+    moves = []
+    connection = Connection(sock, on_move=moves.append).start(spectate=True)
+    peer.sendall(encode_frame(MSG_MOVE, 0, bytes([9])))
+    assert connection.closed.wait(2.0)
+    assert moves == []
+    assert peer.recv(HEADER.size) == b""  # closed without acknowledging the move
+    peer.close()
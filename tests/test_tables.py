@@ -0,0 +1,59 @@
+import build_book
+from engine import BOOK_WIN, WIN_SCORE, Connect4Game, OpeningBook, TranspositionTable
+from engine.tables import EXACT, LOWER_BOUND
+
+
+def test_probe_returns_what_was_stored():
+    tt = TranspositionTable(size=11)
+    assert tt.probe(5) is None
+    tt.store(5, 3, EXACT, 12, 4)
+    assert tt.probe(5) == (3, EXACT, 12, 4)
+    assert tt.probe(16) is None  # same slot, other key
+    assert (tt.probes, tt.hits, tt.stores) == (3, 1, 1)
+
+
+def test_deeper_entry_of_the_same_search_is_kept():
+    tt = TranspositionTable(size=11)
+    tt.store(5, 6, EXACT, 1, 0)
+    tt.store(16, 2, LOWER_BOUND, 2, 1)
+    assert tt.probe(5) == (6, EXACT, 1, 0) and tt.probe(16) is None
+    tt.store(16, 6, LOWER_BOUND, 2, 1)  # as deep: replaces
+    assert tt.probe(16) == (6, LOWER_BOUND, 2, 1) and tt.evictions == 1
+
+
+def test_entries_from_an_earlier_search_are_replaced():
+    tt = TranspositionTable(size=11)
+    tt.store(5, 6, EXACT, 1, 0)
+    tt.new_search()
+    tt.store(16, 1, EXACT, 2, 1)
+    assert tt.probe(16) == (1, EXACT, 2, 1) and tt.probe(5) is None
+
+
+def test_table_does_not_change_search_results():
+    # A table as small as one slot evicts constantly; scores must not depend on it
+    moves = [3, 3, 2, 4, 4]
+    scores = []
+    for tt_size in (1, 1009, 262139):
+        game = Connect4Game(tt_size=tt_size)
+        for col in moves:
+            game.make_move(col)
+        scores.append(game.score_columns(5))
+    assert scores[0] == scores[1] == scores[2]
+
+
+def test_book_keeps_proven_wins(tmp_path):
+    # WIN_SCORE does not fit the book's int16 score; it is stored as BOOK_WIN
+    moves = [0, 3, 0, 3, 1, 3, 6]  # piece 2 wins by playing column 3
+    game = Connect4Game()
+    for col in moves:
+        game.make_move(col)
+    record = build_book.solve(game.bitboard.position(), 4)
+    assert record[1:] == (3, 1, BOOK_WIN)
+    path = str(tmp_path / "book.bin")
+    build_book.write_book(path, len(moves), [record])
+
+    game.opening_book = OpeningBook(path)
+    assert game.book_move() == 3
+    assert game.last_search.score == WIN_SCORE
+    assert game.last_search.column_scores == {3: WIN_SCORE}
+    game.opening_book.close()